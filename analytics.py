@@ -0,0 +1,211 @@
+"""
+UI-free analytics behind the dashboard
+
+Pure functions computing the KPI values, the aggregated data behind each
+chart and the summary table from a filtered slice of the aggregate cube.
+They have no Streamlit dependency, so the same results can be produced by
+batch jobs and other services.
+"""
+import hashlib
+import math
+
+import numpy as np
+
+import cube
+from figure_cache import filter_key
+
+SUMMARY_COLS = ['Revenue', 'Net_Income', 'Earning_Per_Share', 'Market_Cap', 'ROE', 'ROA']
+CASH_FLOW_COLS = ['Cash_Flow_from_Operating', 'Cash_Flow_from_Investing', 'Cash_Flow_from_Financial_Activities']
+
+
+def aggregate_key(companies, year_range, industries, data_version):
+    """Return a stable string key for the aggregates of a filter state"""
+    # The aggregate names are part of the key, so stored results never lack a newer one
+    state = repr((filter_key(companies, year_range, industries, data_version), sorted(AGGREGATES)))
+    return 'agg-' + hashlib.sha256(state.encode()).hexdigest()[:32]
+
+
+def kpis(cube_slice):
+    """Return the raw values of the key metric cards"""
+    return {
+        'companies': int(cube_slice['Company'].nunique()),
+        'avg_revenue': cube.total(cube_slice, 'Revenue'),
+        'total_market_cap': cube.total(cube_slice, 'Market_Cap', how='sum'),
+        'avg_employees': cube.total(cube_slice, 'Number_of_Employees'),
+        'avg_eps': cube.total(cube_slice, 'Earning_Per_Share')
+    }
+
+
+def revenue_by_company(cube_slice):
+    """Total revenue per company, ascending"""
+    return cube.rollup(cube_slice, 'Company', ['Revenue'], how='sum')['Revenue'].sort_values(ascending=True)
+
+
+def market_cap_by_company(cube_slice):
+    """Average market cap per company"""
+    return cube.rollup(cube_slice, 'Company', ['Market_Cap'])['Market_Cap']
+
+
+def revenue_trend(cube_slice):
+    """Average revenue per year (rows) and company (columns), missing as 0"""
+    return (
+        cube.rollup(cube_slice, ['Year', 'Company'], ['Revenue'])['Revenue']
+        .unstack('Company')
+        .dropna(axis=1, how='all')
+        .fillna(0)
+    )
+
+
+def industry_metrics(cube_slice):
+    """Average revenue, net income and market cap per industry, by revenue"""
+    return cube.rollup(
+        cube_slice, 'Industry', ['Revenue', 'Net_Income', 'Market_Cap']
+    ).sort_values('Revenue', ascending=True)
+
+
+def employee_counts(cube_slice):
+    """Average employee count per company, descending"""
+    return cube.rollup(cube_slice, 'Company', ['Number_of_Employees'])['Number_of_Employees'].sort_values(ascending=False)
+
+
+def profit_margins(cube_slice):
+    """Average net profit margin per company, ascending"""
+    return cube.rollup(cube_slice, 'Company', ['Net_Profit_Margin'])['Net_Profit_Margin'].sort_values(ascending=True)
+
+
+def cash_flow(cube_slice):
+    """Average operating, investing and financing cash flow per company"""
+    return cube.rollup(cube_slice, 'Company', CASH_FLOW_COLS)
+
+
+def growth_by_company(cube_slice):
+    """Average year-over-year revenue growth and 3-year revenue CAGR per company"""
+    return cube.rollup(cube_slice, 'Company', ['Revenue_YoY', 'Revenue_CAGR_3Y'])
+
+
+def real_revenue_trend(cube_slice):
+    """Total nominal and inflation-adjusted revenue per year"""
+    return cube.rollup(cube_slice, 'Year', ['Revenue', 'Real_Revenue'], how='sum')
+
+
+def summary_stats(cube_slice):
+    """Per-company means for the summary table, rounded to 2 decimals"""
+    return cube.rollup(cube_slice, 'Company', SUMMARY_COLS).round(2)
+
+
+def format_currency(value):
+    """Format an amount in millions as $M, or as $B from a thousand up"""
+    if value >= 1000:
+        return f"${value/1000:.1f}B"
+    else:
+        return f"${value:.1f}M"
+
+
+def format_number(value):
+    """Format a large count with a K or M suffix"""
+    if value >= 1000000:
+        return f"{value/1000000:.1f}M"
+    elif value >= 1000:
+        return f"{value/1000:.1f}K"
+    else:
+        return f"{value:.0f}"
+
+
+def format_kpis(kpis):
+    """Return the (title, formatted value) of each key metric card"""
+    return [
+        ("Companies", kpis['companies']),
+        ("Avg Revenue", format_currency(kpis['avg_revenue'] / 1000)),  # Convert to billions
+        ("Total Market Cap", format_currency(kpis['total_market_cap'])),
+        ("Avg Employees", format_number(kpis['avg_employees'])),
+        ("Avg EPS", f"${kpis['avg_eps']:.2f}")
+    ]
+
+
+# Display format and scale of each summary column (Revenue and Net Income are in millions)
+SUMMARY_FORMATS = {
+    'Revenue': ('$%.1fB', 1000),
+    'Net_Income': ('$%.1fB', 1000),
+    'Earning_Per_Share': ('$%.2f', 1),
+    'Market_Cap': ('$%.1fB', 1),
+    'ROE': ('%.1f%%', 1),
+    'ROA': ('%.1f%%', 1)
+}
+
+
+def format_summary(summary):
+    """Format the summary table's numbers for display"""
+    formatted_summary = summary.copy()
+    for column, (template, scale) in SUMMARY_FORMATS.items():
+        formatted_summary[column] = np.char.mod(template, summary[column].to_numpy(dtype=np.float64) / scale)
+    return formatted_summary
+
+
+def scale_summary(summary):
+    """Rescale the summary columns to the units of SUMMARY_FORMATS, keeping numbers"""
+    scaled = summary.copy()
+    for column, (_, scale) in SUMMARY_FORMATS.items():
+        if scale != 1:
+            scaled[column] = scaled[column] / scale
+    return scaled
+
+
+def query_summary(summary, search='', sort_by=None, descending=False):
+    """Filter the summary by company name and sort it by a column"""
+    rows = summary
+    if search:
+        rows = rows[rows.index.astype(str).str.contains(search, case=False, regex=False)]
+    if sort_by and sort_by != rows.index.name:
+        rows = rows.sort_values(sort_by, ascending=not descending, kind='stable', na_position='last')
+    elif descending:
+        rows = rows.iloc[::-1]
+    return rows
+
+
+def summary_page(summary, page=1, page_size=50, **query):
+    """Return one page of the queried summary and its (page, pages, matching rows)"""
+    rows = query_summary(summary, **query)
+    pages = max(1, math.ceil(len(rows) / page_size))
+    page = min(max(1, int(page)), pages)
+    start = (page - 1) * page_size
+    return rows.iloc[start:start + page_size], (page, pages, len(rows))
+
+
+def summary_csv_chunks(summary, chunk_rows=10000):
+    """Yield the summary as CSV text, a bounded block of rows at a time"""
+    yield summary.iloc[:0].to_csv()
+    for start in range(0, len(summary), chunk_rows):
+        yield summary.iloc[start:start + chunk_rows].to_csv(header=False)
+
+
+AGGREGATES = {
+    'kpis': kpis,
+    'revenue_by_company': revenue_by_company,
+    'market_cap_by_company': market_cap_by_company,
+    'revenue_trend': revenue_trend,
+    'industry_metrics': industry_metrics,
+    'employee_counts': employee_counts,
+    'profit_margins': profit_margins,
+    'cash_flow': cash_flow,
+    'growth_by_company': growth_by_company,
+    'real_revenue_trend': real_revenue_trend,
+    'summary': summary_stats
+}
+
+
+def compute_aggregates(cube_slice):
+    """Return every cube-backed aggregate of the dashboard for one filter state"""
+    return {name: compute(cube_slice) for name, compute in AGGREGATES.items()}
+
+
+def load_or_compute_aggregates(full_cube, companies, year_range, industries, data_version, store=None):
+    """Return the aggregates for a filter state, reading through ``store`` if given"""
+    key = aggregate_key(companies, year_range, industries, data_version)
+    if store is not None:
+        aggregates = store.get(key)
+        if aggregates is not None:
+            return aggregates
+    aggregates = compute_aggregates(cube.slice_cube(full_cube, companies, year_range, industries))
+    if store is not None:
+        store.put(key, aggregates)
+    return aggregates
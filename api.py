@@ -0,0 +1,272 @@
+"""
+Headless HTTP API for the dashboard aggregates
+
+Serves the aggregates behind the dashboard's charts and summary table (the
+names in ``analytics.AGGREGATES``, e.g. ``revenue_by_company``,
+``industry_metrics``, ``cash_flow`` and ``summary``) as JSON or as an Arrow
+IPC stream, for the same company/year/industry filter as the sidebar,
+without going through a Streamlit rerun:
+
+    python api.py [--host 127.0.0.1] [--port 8502]
+
+    GET /aggregates                                  names and data version
+    GET /aggregates/cash_flow?companies=AAPL,MSFT&year_from=2015&year_to=2022
+    GET /aggregates/summary?industries=IT&format=arrow
+    GET /health
+    GET /metrics                                     Prometheus text
+
+Filter parameters may be repeated or comma-separated; a missing one selects
+everything. Every response carries an ETag derived from the aggregate key,
+i.e. the filter and the data version of the selected cells, so a poller that
+sends ``If-None-Match`` gets an empty 304 until new rows land in its
+selection. Encoded responses are kept in an in-process LRU, and the
+aggregates themselves are read through the shared aggregate store that the
+dashboard and precompute.py fill.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import analytics
+from byte_lru import ByteLRU
+from lazy_imports import lazy_module
+
+# Only needed for Arrow responses
+pa = lazy_module('pyarrow')
+
+logger = logging.getLogger(__name__)
+
+JSON_TYPE = 'application/json'
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+FORMATS = {'json': JSON_TYPE, 'arrow': ARROW_TYPE}
+
+
+def parse_filter(query, data):
+    """Resolve query parameters into concrete companies, year range and industries
+
+    Raises ValueError on a malformed year.
+    """
+    def values(name):
+        return [value for item in query.get(name, []) for value in item.split(',') if value]
+
+    index = data.index
+    companies = values('companies') or list(index.company.labels)
+    industries = values('industries') or list(index.industry.labels)
+    year_range = []
+    for name, default in (('year_from', index.sorted_years[0]), ('year_to', index.sorted_years[-1])):
+        value = query.get(name, [''])[-1]
+        try:
+            year_range.append(int(value) if value else int(default))
+        except ValueError:
+            raise ValueError(f"{name} must be a year, got {value!r}") from None
+    return companies, tuple(year_range), industries
+
+
+def aggregate_frame(value):
+    """Return an aggregate (KPI dict, Series or DataFrame) as a flat frame"""
+    if isinstance(value, dict):
+        frame = pd.DataFrame([value])
+    else:
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        frame = frame.reset_index()
+    frame.columns = [str(column) for column in frame.columns]
+    return frame
+
+
+def encode(frame, fmt, meta):
+    """Serialize a frame and its metadata as a JSON document or an Arrow IPC stream"""
+    if fmt == 'arrow':
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({key: json.dumps(value) for key, value in meta.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    # to_json maps NaN to null and numpy scalars to plain numbers
+    rows = json.loads(frame.to_json(orient='records', double_precision=15))
+    return json.dumps({**meta, 'columns': list(frame.columns), 'rows': rows}).encode()
+
+
+def etag_matches(header, etag):
+    """Return whether an If-None-Match header lists ``etag`` (weak comparison)"""
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+class AggregateAPI:
+    """Request handling, independent of the HTTP server
+
+    ``dataset`` offers ``current()`` and ``refresh()`` like ``ingest.Dataset``
+    and ``shared_dataset.SharedDataset``; ``store`` is the shared aggregate
+    store, or None.
+    """
+
+    def __init__(self, dataset, store=None, cache_bytes=32 * 1024 * 1024):
+        self.dataset = dataset
+        self.store = store
+        self.cache = ByteLRU(cache_bytes)
+        self._lock = threading.Lock()
+        self.counts = {'requests': 0, 'not_modified': 0, 'cache_hits': 0, 'computed': 0, 'errors': 0}
+        self.compute_seconds = 0.0
+
+    def _count(self, name, seconds=0.0):
+        with self._lock:
+            self.counts[name] += 1
+            self.compute_seconds += seconds
+
+    def handle(self, path, query, headers):
+        """Return (status, headers, body) for a GET request"""
+        self._count('requests')
+        if path == '/metrics':
+            return 200, {'Content-Type': 'text/plain; version=0.0.4'}, self.prometheus_text().encode()
+        # Picks up newly ingested or published data at most every INGEST_POLL_SECONDS
+        self.dataset.refresh()
+        data = self.dataset.current()
+        if path == '/health':
+            return self._json(200, {'status': 'ok', 'data_version': data.version, 'rows': len(data.frame)})
+        if path == '/aggregates':
+            return self._json(200, {'aggregates': sorted(analytics.AGGREGATES), 'data_version': data.version})
+        if not path.startswith('/aggregates/'):
+            return self._error(404, f"No such endpoint: {path}")
+        name = path[len('/aggregates/'):]
+        if name not in analytics.AGGREGATES:
+            return self._error(404, f"Unknown aggregate '{name}'; see /aggregates")
+        fmt = query.get('format', [''])[-1] or ('arrow' if ARROW_TYPE in headers.get('Accept', '') else 'json')
+        if fmt not in FORMATS:
+            return self._error(400, f"format must be one of {', '.join(FORMATS)}")
+        try:
+            companies, year_range, industries = parse_filter(query, data)
+        except ValueError as e:
+            return self._error(400, str(e))
+
+        data_version = data.version_for(companies, year_range, industries)
+        key = analytics.aggregate_key(companies, year_range, industries, data_version)
+        etag = '"' + hashlib.sha256(f'{key}/{name}.{fmt}'.encode()).hexdigest()[:32] + '"'
+        response_headers = {
+            'ETag': etag,
+            # Clients may keep the body but must revalidate it, which is a 304 until the data changes
+            'Cache-Control': 'no-cache',
+            'Content-Type': FORMATS[fmt],
+            'Vary': 'Accept'
+        }
+        if etag_matches(headers.get('If-None-Match'), etag):
+            self._count('not_modified')
+            return 304, response_headers, b''
+        body = self.cache.get(etag)
+        if body is not None:
+            self._count('cache_hits')
+            return 200, response_headers, body
+
+        start = time.perf_counter()
+        aggregates = analytics.load_or_compute_aggregates(
+            data.cube, companies, year_range, industries, data_version, self.store
+        )
+        meta = {
+            'aggregate': name,
+            'data_version': data_version,
+            'filter': {
+                'companies': query.get('companies') and companies,
+                'year_range': list(year_range),
+                'industries': query.get('industries') and industries
+            }
+        }
+        body = encode(aggregate_frame(aggregates[name]), fmt, meta)
+        self.cache.put(etag, body, len(body))
+        self._count('computed', time.perf_counter() - start)
+        return 200, response_headers, body
+
+    def _json(self, status, payload):
+        return status, {'Content-Type': JSON_TYPE, 'Cache-Control': 'no-cache'}, json.dumps(payload).encode()
+
+    def _error(self, status, message):
+        self._count('errors')
+        return self._json(status, {'error': message})
+
+    def prometheus_text(self):
+        """Render the request counters in the Prometheus text exposition format"""
+        with self._lock:
+            counts = dict(self.counts)
+            compute_seconds = self.compute_seconds
+        metrics = [
+            ('api_requests_total', 'Requests received', counts['requests']),
+            ('api_not_modified_total', 'Conditional requests answered with 304', counts['not_modified']),
+            ('api_cache_hits_total', 'Responses served from the response cache', counts['cache_hits']),
+            ('api_computed_total', 'Responses encoded from the aggregate store or cube', counts['computed']),
+            ('api_errors_total', 'Requests rejected with a 4xx status', counts['errors']),
+            ('api_compute_seconds_total', 'Time spent computing and encoding responses', f'{compute_seconds:.6f}')
+        ]
+        lines = []
+        for metric, description, value in metrics:
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+        lines.append('# HELP api_cache_bytes Bytes held by the response cache')
+        lines.append('# TYPE api_cache_bytes gauge')
+        lines.append(f'api_cache_bytes {self.cache.current_bytes}')
+        return '\n'.join(lines) + '\n'
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Maps GET requests onto the server's AggregateAPI"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            status, headers, body = self.server.api.handle(
+                url.path.rstrip('/') or '/', parse_qs(url.query), self.headers
+            )
+        except Exception:
+            logger.exception("Failed to serve %s", self.path)
+            status, headers, body = 500, {'Content-Type': JSON_TYPE}, b'{"error": "internal error"}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+
+def make_server(api, host, port):
+    """Return a threaded HTTP server answering with ``api``"""
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.api = api
+    return server
+
+
+if __name__ == '__main__':
+    from app_config import AGGREGATE_STORE_MB, API_CACHE_MB, API_HOST, API_PORT
+    from cache_backend import open_store
+    from shared_dataset import open_dataset
+
+    parser = argparse.ArgumentParser(description='Serve the dashboard aggregates over HTTP')
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    api = AggregateAPI(
+        open_dataset(), open_store('aggregates', AGGREGATE_STORE_MB * 1024 * 1024), API_CACHE_MB * 1024 * 1024
+    )
+    server = make_server(api, args.host, args.port)
+    print(f"Serving aggregates on http://{args.host}:{args.port}/aggregates")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
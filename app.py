@@ -1,16 +1,28 @@
+import logging
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.feature_selection import SelectFromModel
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import RobustScaler
-from sklearn.cluster import KMeans
-from sklearn.manifold import TSNE
-import seaborn as sns
-import matplotlib.pyplot as plt
+
+import analytics
+import charts
+import cube
+import sections
+import shared_dataset
+import telemetry
+from app_config import (
+    AGGREGATE_STORE_MB, EPS_PARAMS_FILE, FIGURE_CACHE_MB, FIGURE_STORE_MB, METRICS_FILE, MODEL_STORE_MB,
+    PROFILE_SECTIONS, TRAINING_WORKERS
+)
+from cache_backend import open_store
+from figure_cache import FigureCache, filter_key
+from lazy_imports import lazy_module
+
+# The ML stack (scikit-learn) is only loaded when an ML section is switched on
+clustering = lazy_module('clustering')
+embedding = lazy_module('embedding')
+eps_model = lazy_module('eps_model')
+training_jobs = lazy_module('training_jobs')
 
 st.set_page_config(
     page_title="Corporate Financial Analysis & ML Dashboard",
@@ -412,27 +424,73 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+@st.cache_resource
+def load_dataset():
+    """Load the columnar snapshot plus every ingested partition, or attach to the published dataset
+
+    Errors propagate, so a failed load is not cached and the next rerun retries it.
+    """
+    # Shared read-only across sessions so the memory-mapped columns are not copied
+    return shared_dataset.open_dataset()
+
 def load_data():
-    """Load and preprocess the financial data"""
+    """Return the current rows, aggregate cube, filter index and data version"""
     try:
-        df = pd.read_csv('/Users/basalel/Desktop/finacial/cooperate-Analysis and Machine Learning/Financial Statements.csv')
-        # Clean column names
-        df.columns = df.columns.str.strip()
-        df.rename(columns={
-            'Company ': 'Company',
-            'Market Cap(in B USD)': 'Market_Cap',
-            'Category': 'Industry',
-            'Inflation Rate(in US)': 'Inflation_Rate'
-        }, inplace=True)
-        
-        # Convert column names to snake_case for consistency
-        df.columns = df.columns.str.replace(' ', '_').str.replace('/', '_')
-        
-        return df
+        dataset = load_dataset()
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return None
+    # Picks up newly dropped statement files at most every INGEST_POLL_SECONDS
+    dataset.refresh()
+    return dataset.current()
+
+@st.cache_resource
+def load_figure_cache():
+    """Create the figure cache shared by all sessions, backed by the cross-process store"""
+    return FigureCache(
+        max_bytes=FIGURE_CACHE_MB * 1024 * 1024, shared=open_store('figures', FIGURE_STORE_MB * 1024 * 1024)
+    )
+
+@st.cache_resource
+def load_model_store():
+    """Open the shared store of trained EPS models"""
+    return open_store('models', MODEL_STORE_MB * 1024 * 1024)
+
+@st.cache_resource
+def load_aggregate_store():
+    """Open the shared store of precomputed dashboard aggregates"""
+    return open_store('aggregates', AGGREGATE_STORE_MB * 1024 * 1024)
+
+@st.cache_resource
+def load_training_jobs():
+    """Start the background training pool shared by all sessions"""
+    return training_jobs.TrainingJobs(load_model_store(), max_workers=TRAINING_WORKERS)
+
+@st.cache_resource
+def load_telemetry():
+    """Create the span collector and its JSON log handler"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    telemetry.logger.addHandler(handler)
+    telemetry.logger.setLevel(logging.INFO)
+    telemetry.logger.propagate = False
+    return telemetry.Telemetry(metrics_file=METRICS_FILE)
+
+@st.cache_resource
+def load_cluster_model(data_version, n_clusters, _full_cube):
+    """Fit the company clusters once per data version and cluster count"""
+    store = load_model_store()
+    key = f"clusters-{data_version}-{n_clusters}"
+    model = store.get(key)
+    if model is None:
+        model = clustering.fit_clusters(clustering.company_profiles(_full_cube), n_clusters)
+        store.put(key, model)
+    return model
+
+@st.cache_resource
+def load_embedding(data_version, _df):
+    """Load (or compute and persist) the t-SNE company map for a data version"""
+    return embedding.load_or_embed(_df, load_model_store(), data_version)
 
 def create_metric_card(title, value, delta=None):
     """Create a metric card with custom styling"""
@@ -454,30 +512,16 @@ def create_metric_card(title, value, delta=None):
         </div>
         """
 
-def format_currency(value):
-    """Format currency values"""
-    if value >= 1000:
-        return f"${value/1000:.1f}B"
-    else:
-        return f"${value:.1f}M"
-
-def format_number(value):
-    """Format large numbers"""
-    if value >= 1000000:
-        return f"{value/1000000:.1f}M"
-    elif value >= 1000:
-        return f"{value/1000:.1f}K"
-    else:
-        return f"{value:.0f}"
-
 def main():
     st.title("📊 Corporate Financial Analysis Dashboard")
     
     # Load data
-    df = load_data()
-    if df is None:
+    with telemetry.span('load_data'):
+        data = load_data()
+    if data is None:
         st.error("Failed to load data. Please check the file path.")
         return
+    df = data.frame
     
     # Sidebar filters
     st.sidebar.markdown("### Filters")
@@ -504,409 +548,335 @@ def main():
         default=sorted(df['Industry'].unique())
     )
     
-    # Filter data
-    filtered_df = df[
-        (df['Company'].isin(companies)) & 
-        (df['Year'] >= year_range[0]) & 
-        (df['Year'] <= year_range[1]) &
-        (df['Industry'].isin(industries))
-    ]
+    # Filter data (resolved lazily: only sections that need rows pay for it)
+    def filter_rows():
+        with telemetry.span('filter_rows'):
+            return data.index.apply(df, companies, year_range, industries)
     
-    if filtered_df.empty:
-        st.warning("No data available for the selected filters.")
-        return
+    def filter_cube():
+        with telemetry.span('filter_cube'):
+            return cube.slice_cube(data.cube, companies, year_range, industries)
     
-    # Main dashboard grid layout
-    
-    # Row 1: Key Metrics Cards
-    col1, col2, col3, col4, col5 = st.columns(5)
+    filtered_rows = sections.Lazy(filter_rows)
+    filtered_cube = sections.Lazy(filter_cube)
     
-    with col1:
-        total_companies = len(filtered_df['Company'].unique())
-        st.markdown(create_metric_card("Companies", total_companies), unsafe_allow_html=True)
+    # Rendered figures are reused when a filter combination repeats; the version
+    # only changes when newly ingested rows fall inside the selection
+    figures = load_figure_cache()
+    data_version = data.version_for(companies, year_range, industries)
+    figure_key = filter_key(companies, year_range, industries, data_version)
     
-    with col2:
-        avg_revenue = filtered_df['Revenue'].mean() / 1000  # Convert to billions
-        st.markdown(create_metric_card("Avg Revenue", format_currency(avg_revenue)), unsafe_allow_html=True)
+    # Cube-backed aggregates, precomputed by precompute.py or computed once per filter state
+    with telemetry.span('aggregates'):
+        aggregates = sections.section('aggregates', figure_key, lambda: analytics.load_or_compute_aggregates(
+            data.cube, companies, year_range, industries, data_version, load_aggregate_store()
+        ))
     
-    with col3:
-        total_market_cap = filtered_df['Market_Cap'].sum()
-        st.markdown(create_metric_card("Total Market Cap", format_currency(total_market_cap)), unsafe_allow_html=True)
+    if aggregates['kpis']['companies'] == 0:
+        st.warning("No data available for the selected filters.")
+        return
     
-    with col4:
-        avg_employees = filtered_df['Number_of_Employees'].mean()
-        st.markdown(create_metric_card("Avg Employees", format_number(avg_employees)), unsafe_allow_html=True)
+    # Main dashboard grid layout; every section depends on the filter state
     
-    with col5:
-        avg_eps = filtered_df['Earning_Per_Share'].mean()
-        st.markdown(create_metric_card("Avg EPS", f"${avg_eps:.2f}"), unsafe_allow_html=True)
+    # Row 1: Key Metrics Cards
+    with telemetry.span('kpis'):
+        render_kpis(sections.section('kpis', figure_key, lambda: analytics.format_kpis(aggregates['kpis'])))
     
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Row 2: Charts Grid
-    col1, col2, col3 = st.columns([1, 1, 1])
-    
-    with col1:
-        # Revenue by Company (Bar Chart)
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Revenue by Company")
-        revenue_by_company = filtered_df.groupby('Company')['Revenue'].sum().sort_values(ascending=True)
-        fig1 = px.bar(
-            x=revenue_by_company.values/1000,
-            y=revenue_by_company.index,
-            orientation='h',
-            template='plotly_dark',
-            color=revenue_by_company.values,
-            color_continuous_scale='Viridis'
-        )
-        fig1.update_layout(
-            height=300,
-            showlegend=False,
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5',
-            xaxis_title="Revenue (Billions)",
-            yaxis_title="Company"
-        )
-        st.plotly_chart(fig1, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        # Market Cap Distribution (Pie Chart)
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Market Cap Distribution")
-        market_cap_by_company = filtered_df.groupby('Company')['Market_Cap'].mean()
-        fig2 = px.pie(
-            values=market_cap_by_company.values,
-            names=market_cap_by_company.index,
-            template='plotly_dark'
+    with telemetry.span('overview'):
+        render_chart_row(
+            [1, 1, 1],
+            sections.section('overview', figure_key, lambda: compute_overview(figures, figure_key, aggregates, filtered_rows))
         )
-        fig2.update_layout(
-            height=300,
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5'
-        )
-        st.plotly_chart(fig2, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col3:
-        # ROE vs ROA Scatter
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("ROE vs ROA")
-        fig3 = px.scatter(
-            filtered_df,
-            x='ROA',
-            y='ROE',
-            color='Company',
-            size='Market_Cap',
-            template='plotly_dark'
-        )
-        fig3.update_layout(
-            height=300,
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5'
-        )
-        st.plotly_chart(fig3, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
     
     # Row 3: Time Series and Performance Charts
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Revenue Over Time (Stacked Bar)
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Revenue Trends Over Time")
-        revenue_time = filtered_df.pivot_table(
-            values='Revenue', 
-            index='Year', 
-            columns='Company', 
-            aggfunc='mean'
-        ).fillna(0)
-        
-        fig4 = go.Figure()
-        for company in revenue_time.columns:
-            fig4.add_trace(go.Bar(
-                name=company,
-                x=revenue_time.index,
-                y=revenue_time[company]/1000,
-            ))
-        
-        fig4.update_layout(
-            barmode='stack',
-            height=300,
-            template='plotly_dark',
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5',
-            xaxis_title="Year",
-            yaxis_title="Revenue (Billions)"
+    with telemetry.span('trends'):
+        render_chart_row(
+            2,
+            sections.section('trends', figure_key, lambda: compute_trends(figures, figure_key, aggregates))
         )
-        st.plotly_chart(fig4, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        # Industry Performance (Horizontal Bar)
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Performance by Industry")
-        industry_metrics = filtered_df.groupby('Industry').agg({
-            'Revenue': 'mean',
-            'Net_Income': 'mean',
-            'Market_Cap': 'mean'
-        }).sort_values('Revenue', ascending=True)
-        
-        fig5 = go.Figure()
-        fig5.add_trace(go.Bar(
-            name='Revenue',
-            y=industry_metrics.index,
-            x=industry_metrics['Revenue']/1000,
-            orientation='h',
-            marker_color='#00cc96'
-        ))
-        fig5.add_trace(go.Bar(
-            name='Net Income',
-            y=industry_metrics.index,
-            x=industry_metrics['Net_Income']/1000,
-            orientation='h',
-            marker_color='#ef553b'
-        ))
-        
-        fig5.update_layout(
-            barmode='group',
-            height=300,
-            template='plotly_dark',
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5',
-            xaxis_title="Amount (Billions)",
-            yaxis_title="Industry"
-        )
-        st.plotly_chart(fig5, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
     
     # Row 4: Financial Ratios and Employee Analysis
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        # Financial Ratios Box Plot
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Financial Ratios Distribution")
-        ratios_df = filtered_df[['Company', 'Current_Ratio', 'Debt_Equity_Ratio']].melt(
-            id_vars=['Company'], 
-            var_name='Ratio_Type', 
-            value_name='Value'
-        )
-        fig6 = px.box(
-            ratios_df,
-            x='Ratio_Type',
-            y='Value',
-            template='plotly_dark'
-        )
-        fig6.update_layout(
-            height=300,
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5'
-        )
-        st.plotly_chart(fig6, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        # Employee Count by Company
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Employee Count")
-        employee_data = filtered_df.groupby('Company')['Number_of_Employees'].mean().sort_values(ascending=False)
-        fig7 = px.bar(
-            x=employee_data.index,
-            y=employee_data.values,
-            template='plotly_dark',
-            color=employee_data.values,
-            color_continuous_scale='Blues'
-        )
-        fig7.update_layout(
-            height=300,
-            showlegend=False,
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5',
-            xaxis_title="Company",
-            yaxis_title="Employees"
+    with telemetry.span('ratios'):
+        render_chart_row(
+            3,
+            sections.section('ratios', figure_key, lambda: compute_ratios(figures, figure_key, aggregates, filtered_rows))
         )
-        st.plotly_chart(fig7, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col3:
-        # Profit Margin Analysis
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Profit Margins")
-        margin_data = filtered_df.groupby('Company')['Net_Profit_Margin'].mean().sort_values(ascending=True)
-        fig8 = px.bar(
-            x=margin_data.values,
-            y=margin_data.index,
-            orientation='h',
-            template='plotly_dark',
-            color=margin_data.values,
-            color_continuous_scale='RdYlGn'
-        )
-        fig8.update_layout(
-            height=300,
-            showlegend=False,
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5',
-            xaxis_title="Net Profit Margin (%)",
-            yaxis_title="Company"
-        )
-        st.plotly_chart(fig8, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
     
     # Row 5: Large Charts
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # EPS Trend Analysis
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Earnings Per Share Trends")
-        fig9 = px.line(
-            filtered_df,
-            x='Year',
-            y='Earning_Per_Share',
-            color='Company',
-            template='plotly_dark',
-            markers=True
-        )
-        fig9.update_layout(
-            height=400,
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5'
+    with telemetry.span('large_charts'):
+        render_chart_row(
+            2,
+            sections.section('large', figure_key, lambda: compute_large_charts(figures, figure_key, aggregates, filtered_rows))
         )
-        st.plotly_chart(fig9, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        # Cash Flow Analysis
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.subheader("Cash Flow Analysis")
-        cash_flow_data = filtered_df.groupby('Company').agg({
-            'Cash_Flow_from_Operating': 'mean',
-            'Cash_Flow_from_Investing': 'mean',
-            'Cash_Flow_from_Financial_Activities': 'mean'
-        })
-        
-        fig10 = go.Figure()
-        fig10.add_trace(go.Bar(
-            name='Operating',
-            x=cash_flow_data.index,
-            y=cash_flow_data['Cash_Flow_from_Operating']/1000,
-            marker_color='#00cc96'
-        ))
-        fig10.add_trace(go.Bar(
-            name='Investing',
-            x=cash_flow_data.index,
-            y=cash_flow_data['Cash_Flow_from_Investing']/1000,
-            marker_color='#ef553b'
-        ))
-        fig10.add_trace(go.Bar(
-            name='Financial',
-            x=cash_flow_data.index,
-            y=cash_flow_data['Cash_Flow_from_Financial_Activities']/1000,
-            marker_color='#ffa15a'
-        ))
-        
-        fig10.update_layout(
-            barmode='group',
-            height=400,
-            template='plotly_dark',
-            plot_bgcolor='#2d2d2d',
-            paper_bgcolor='#2d2d2d',
-            font_color='#f5f5f5',
-            xaxis_title="Company",
-            yaxis_title="Cash Flow (Billions)"
+    
+    # Row 6: Growth and Inflation-Adjusted Revenue
+    with telemetry.span('growth'):
+        render_chart_row(
+            2,
+            sections.section('growth', figure_key, lambda: compute_growth(figures, figure_key, aggregates))
         )
-        st.plotly_chart(fig10, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
     
     # Machine Learning Section
     st.markdown("---")
     st.header("🤖 Machine Learning Analysis")
+    with telemetry.span('clusters'):
+        render_cluster_section(figures, figure_key, data, filtered_cube)
+    with telemetry.span('company_map'):
+        render_company_map_section(figures, figure_key, data, companies, year_range, industries)
+    with telemetry.span('eps_model'):
+        render_ml_section(figures, figure_key, filtered_rows)
+    
+    # Data Summary Table
+    st.markdown("---")
+    st.subheader("📋 Financial Data Summary")
+    with telemetry.span('summary'):
+        render_summary_section(aggregates['summary'])
     
+    cache_stats = figures.stats()
+    st.sidebar.caption(
+        f"Figure cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+        f"{cache_stats['bytes'] / (1024 * 1024):.1f} of {cache_stats['max_bytes'] / (1024 * 1024):.0f} MB"
+    )
+    render_memory_report()
+
+def render_memory_report():
+    """Show this worker's resident memory, split into shared and private pages"""
+    memory = telemetry.process_memory()
+    if 'pss' not in memory:
+        st.sidebar.caption(f"Worker memory: {memory['rss'] / (1024 * 1024):.0f} MB peak RSS")
+        return
+    st.sidebar.caption(
+        f"Worker memory: {memory['rss'] / (1024 * 1024):.0f} MB RSS · "
+        f"{memory['pss'] / (1024 * 1024):.0f} MB PSS · {memory['shared'] / (1024 * 1024):.0f} MB shared · "
+        f"{memory['private'] / (1024 * 1024):.0f} MB private"
+    )
+
+def render_kpis(kpis):
+    """Render the key metric cards in one row"""
+    for col, (title, value) in zip(st.columns(len(kpis)), kpis):
+        with col:
+            st.markdown(create_metric_card(title, value), unsafe_allow_html=True)
+
+def render_chart_row(spec, charts_in_row):
+    """Render (title, figure) pairs side by side in styled chart containers"""
+    for col, (title, fig) in zip(st.columns(spec), charts_in_row):
+        with col:
+            st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+            st.subheader(title)
+            st.plotly_chart(fig, use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+def compute_overview(figures, figure_key, aggregates, filtered_rows):
+    """Build the revenue, market cap and ROE/ROA charts"""
+    # Revenue by Company (Bar Chart)
+    fig1 = figures.get_or_build(('revenue_by_company',) + figure_key,
+                                lambda: charts.revenue_by_company_chart(aggregates['revenue_by_company']))
+    # Market Cap Distribution (Pie Chart)
+    fig2 = figures.get_or_build(('market_cap',) + figure_key,
+                                lambda: charts.market_cap_chart(aggregates['market_cap_by_company']))
+    # ROE vs ROA Scatter
+    fig3 = figures.get_or_build(('roe_roa',) + figure_key, lambda: charts.roe_roa_chart(filtered_rows()))
+    return [("Revenue by Company", fig1), ("Market Cap Distribution", fig2), ("ROE vs ROA", fig3)]
+
+def compute_trends(figures, figure_key, aggregates):
+    """Build the revenue-over-time and industry performance charts"""
+    # Revenue Over Time (Stacked Bar)
+    fig4 = figures.get_or_build(('revenue_trend',) + figure_key,
+                                lambda: charts.revenue_trend_chart(aggregates['revenue_trend']))
+    # Industry Performance (Horizontal Bar)
+    fig5 = figures.get_or_build(('industry_performance',) + figure_key,
+                                lambda: charts.industry_performance_chart(aggregates['industry_metrics']))
+    return [("Revenue Trends Over Time", fig4), ("Performance by Industry", fig5)]
+
+def compute_ratios(figures, figure_key, aggregates, filtered_rows):
+    """Build the ratio distribution, employee count and profit margin charts"""
+    # Financial Ratios Box Plot
+    fig6 = figures.get_or_build(('ratio_distribution',) + figure_key, lambda: charts.ratio_distribution_chart(filtered_rows()))
+    # Employee Count by Company
+    fig7 = figures.get_or_build(('employees',) + figure_key,
+                                lambda: charts.employee_chart(aggregates['employee_counts']))
+    # Profit Margin Analysis
+    fig8 = figures.get_or_build(('margins',) + figure_key,
+                                lambda: charts.margin_chart(aggregates['profit_margins']))
+    return [("Financial Ratios Distribution", fig6), ("Employee Count", fig7), ("Profit Margins", fig8)]
+
+def compute_large_charts(figures, figure_key, aggregates, filtered_rows):
+    """Build the EPS trend and cash flow charts"""
+    # EPS Trend Analysis
+    fig9 = figures.get_or_build(('eps_trend',) + figure_key, lambda: charts.eps_trend_chart(filtered_rows()))
+    # Cash Flow Analysis
+    fig10 = figures.get_or_build(('cash_flow',) + figure_key, lambda: charts.cash_flow_chart(aggregates['cash_flow']))
+    return [("Earnings Per Share Trends", fig9), ("Cash Flow Analysis", fig10)]
+
+def compute_growth(figures, figure_key, aggregates):
+    """Build the revenue growth and real revenue charts"""
+    # YoY Growth and CAGR by Company
+    fig11 = figures.get_or_build(('growth',) + figure_key,
+                                 lambda: charts.growth_chart(aggregates['growth_by_company']))
+    # Nominal vs Real Revenue
+    fig12 = figures.get_or_build(('real_revenue',) + figure_key,
+                                 lambda: charts.real_revenue_chart(aggregates['real_revenue_trend']))
+    return [("Revenue Growth", fig11), ("Nominal vs Real Revenue", fig12)]
+
+def compute_clusters(figures, figure_key, data, filtered_cube, n_clusters):
+    """Assign the selected companies to the fitted clusters and chart them"""
+    model = load_cluster_model(data.version, n_clusters, data.cube)
+    profiles = clustering.company_profiles(filtered_cube())
+    profiles['Cluster'] = clustering.assign_clusters(model, profiles)
+    # The model is refit whenever any partition lands, even one outside the selection
+    fig = figures.get_or_build(
+        ('clusters', n_clusters, data.version) + figure_key,
+        lambda: charts.cluster_chart(profiles, model['centroids'])
+    )
+    return fig, model['centroids'].round(2)
+
+@sections.fragment
+def render_cluster_section(figures, figure_key, data, filtered_cube):
+    """Render the company clustering view"""
+    with st.expander("Company Clusters by Financial Profile", expanded=False):
+        if not st.toggle("Cluster the selected companies", key="clusters_enabled"):
+            st.caption("Switch on to group companies by their ROE, ROA, ROI, margin, leverage and liquidity.")
+            return
+        n_clusters = st.slider("Clusters", min_value=2, max_value=8, value=4, key="cluster_count")
+        fig, centroids = sections.section(
+            'clusters', figure_key + (n_clusters, data.version),
+            lambda: compute_clusters(figures, figure_key, data, filtered_cube, n_clusters)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption("Cluster centroids (mean ratios)")
+        st.dataframe(centroids, use_container_width=True)
+
+@sections.fragment
+def render_company_map_section(figures, figure_key, data, companies, year_range, industries):
+    """Render the t-SNE company map, highlighting the filtered rows"""
+    with st.expander("Company Map (t-SNE)", expanded=False):
+        # The embedding is computed once per data version, so keep it opt-in
+        if not st.toggle("Show company map", key="company_map_enabled"):
+            st.caption("Switch on to project every company-year onto a 2-D map of the model features.")
+            return
+        coords = load_embedding(data.version, data.frame)
+        fig = figures.get_or_build(('company_map', data.version) + figure_key, lambda: charts.company_map_chart(
+            data.frame, coords, data.index.mask(companies, year_range, industries)
+        ))
+        st.plotly_chart(fig, use_container_width=True)
+
+@sections.fragment
+def render_ml_section(figures, figure_key, filtered_rows):
+    """Render the EPS prediction expander, training only when it is switched on"""
     with st.expander("EPS Performance Prediction", expanded=False):
+        # Collapsed by default, so the forest is only trained on request
+        if not st.toggle("Train model on the current selection", key="eps_model_enabled"):
+            st.caption("Switch on to train the EPS performance model for the selected data.")
+            return
+        with_growth = st.toggle("Include growth and inflation-adjusted features", key="eps_model_growth")
+        feature_set = 'growth' if with_growth else 'base'
+        # Written by tuning.py; a new search changes the parameters and so the section key
+        params, tuned = eps_model.load_tuned_params(EPS_PARAMS_FILE, feature_set)
+        tuned_at = tuned['searched_at'] if tuned else None
         try:
-            # Create binary target based on EPS median
-            ml_df = filtered_df.copy()
-            eps_threshold = ml_df['Earning_Per_Share'].median()
-            ml_df['EPS_Performance'] = (ml_df['Earning_Per_Share'] > eps_threshold).astype(int)
+            state, result = sections.section(
+                'eps_model', figure_key + (with_growth, tuned_at), lambda: load_training_jobs().request(
+                    filtered_rows(), previous=st.session_state.get('eps_model_last'),
+                    feature_cols=eps_model.FEATURE_SETS[feature_set], params=params
+                )
+            )
+            if state == 'too_small':
+                return
+            if state == 'training':
+                # Training runs in a worker process; keep polling on later reruns
+                sections.invalidate('eps_model')
+                st.info("Training the EPS model in the background…")
+                st.button("Check again", key="eps_model_refresh")
+                return
+            # Starting point for an incremental update when the selection grows
+            st.session_state['eps_model_last'] = result
+            how = "updated incrementally" if result.get('mode') == 'incremental' else "trained successfully"
+            st.success(f"Model {how} with {result['accuracy']:.2%} accuracy")
+            if tuned:
+                st.caption(
+                    f"Tuned hyperparameters: {tuned['mean_accuracy']:.2%} ± {tuned['std_accuracy']:.2%} "
+                    f"mean accuracy over {tuned['folds']} "
+                    f"{'company-grouped' if tuned['cv'] == 'group' else 'stratified'} cross-validation folds"
+                )
             
-            # Select features for modeling
-            feature_cols = ['Market_Cap', 'Revenue', 'Gross_Profit', 'Net_Income', 'EBITDA', 
-                           'ROE', 'ROA', 'ROI', 'Current_Ratio', 'Debt_Equity_Ratio']
-            
-            X = ml_df[feature_cols].fillna(0)
-            y = ml_df['EPS_Performance']
-            
-            if len(X) > 10:  # Ensure enough data for modeling
-                # Feature selection using Random Forest
-                rf_selector = RandomForestClassifier(n_estimators=100, random_state=42)
-                selector = SelectFromModel(rf_selector)
-                selector.fit(X, y)
-                X_selected = selector.transform(X)
-                
-                # Train final model
-                X_train, X_test, y_train, y_test = train_test_split(X_selected, y, test_size=0.3, random_state=42)
-                final_model = RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42)
-                final_model.fit(X_train, y_train)
-                
-                accuracy = final_model.score(X_test, y_test)
-                st.success(f"Model trained successfully with {accuracy:.2%} accuracy")
-                
-                # Feature importance
-                feature_importance = final_model.feature_importances_
-                selected_features = [feature_cols[i] for i in range(len(feature_cols)) if selector.get_support()[i]]
-                
-                if len(selected_features) > 0:
-                    fig_importance = px.bar(
-                        x=feature_importance,
-                        y=selected_features,
-                        orientation='h',
-                        title='Feature Importance for EPS Prediction',
-                        template='plotly_dark'
-                    )
-                    fig_importance.update_layout(
-                        plot_bgcolor='#2d2d2d',
-                        paper_bgcolor='#2d2d2d',
-                        font_color='#f5f5f5'
-                    )
-                    st.plotly_chart(fig_importance, use_container_width=True)
+            if len(result['selected_features']) > 0:
+                # Keyed on the stored model, so a retune or an incremental update gets its own figure
+                fig_importance = figures.get_or_build(
+                    ('feature_importance', result['key']) + figure_key,
+                    lambda: charts.feature_importance_chart(result['feature_importance'], result['selected_features'])
+                )
+                st.plotly_chart(fig_importance, use_container_width=True)
                 
         except Exception as e:
             st.error(f"Model training failed: {str(e)}")
-    
-    # Data Summary Table
-    st.markdown("---")
-    st.subheader("📋 Financial Data Summary")
-    
-    # Summary statistics
-    summary_stats = filtered_df.groupby('Company').agg({
-        'Revenue': 'mean',
-        'Net_Income': 'mean',
-        'Earning_Per_Share': 'mean',
-        'Market_Cap': 'mean',
-        'ROE': 'mean',
-        'ROA': 'mean'
-    }).round(2)
-    
-    # Format the dataframe for better display
-    formatted_summary = summary_stats.copy()
-    formatted_summary['Revenue'] = formatted_summary['Revenue'].apply(lambda x: f"${x/1000:.1f}B")
-    formatted_summary['Net_Income'] = formatted_summary['Net_Income'].apply(lambda x: f"${x/1000:.1f}B")
-    formatted_summary['Market_Cap'] = formatted_summary['Market_Cap'].apply(lambda x: f"${x:.1f}B")
-    formatted_summary['Earning_Per_Share'] = formatted_summary['Earning_Per_Share'].apply(lambda x: f"${x:.2f}")
-    formatted_summary['ROE'] = formatted_summary['ROE'].apply(lambda x: f"{x:.1f}%")
-    formatted_summary['ROA'] = formatted_summary['ROA'].apply(lambda x: f"{x:.1f}%")
-    
-    st.dataframe(formatted_summary, use_container_width=True)
+
+SUMMARY_COLUMN_CONFIG = {
+    column: st.column_config.NumberColumn(column, format=template)
+    for column, (template, _) in analytics.SUMMARY_FORMATS.items()
+}
+
+@sections.fragment
+def render_summary_section(summary):
+    """Render one page of the summary table with search, sorting and CSV export"""
+    search_col, sort_col, order_col, size_col = st.columns([3, 2, 1, 1])
+    query = {
+        'search': search_col.text_input("Search companies", key="summary_search"),
+        'sort_by': sort_col.selectbox("Sort by", ['Company'] + analytics.SUMMARY_COLS, key="summary_sort"),
+        'descending': order_col.toggle("Descending", key="summary_descending")
+    }
+    page_size = size_col.selectbox("Rows per page", [25, 50, 100], key="summary_page_size")
+    
+    # Only the visible page is rescaled and sent; the browser applies the number formats
+    rows, (page, pages, matches) = analytics.summary_page(
+        summary, page=st.session_state.get('summary_page', 1), page_size=page_size, **query
+    )
+    st.session_state['summary_page'] = page
+    st.dataframe(analytics.scale_summary(rows), column_config=SUMMARY_COLUMN_CONFIG, use_container_width=True)
+    
+    page_col, caption_col, export_col = st.columns([1, 3, 2])
+    page_col.number_input("Page", min_value=1, max_value=pages, step=1, key="summary_page")
+    caption_col.caption(f"{matches} companies · page {page} of {pages}")
+    with export_col:
+        if st.button("Prepare CSV export", key="summary_export"):
+            st.download_button(
+                "Download CSV",
+                data=''.join(analytics.summary_csv_chunks(analytics.query_summary(summary, **query))),
+                file_name="financial_summary.csv",
+                mime="text/csv",
+                key="summary_download"
+            )
+
+def run_profiled():
+    """Run main() inside a trace and show its spans in the sidebar"""
+    collector = load_telemetry()
+    trace = collector.start()
+    try:
+        with trace.span('total'):
+            main()
+    finally:
+        collector.finish(trace)
+    render_profile_panel(trace)
+
+def render_profile_panel(trace):
+    """Render the spans of this rerun as a sidebar table"""
+    with st.sidebar.expander("Performance", expanded=False):
+        rows = [
+            {
+                'Section': '\u2003' * record['depth'] + record['span'],
+                'Wall (ms)': record.get('wall_ms'),
+                'CPU (ms)': record.get('cpu_ms'),
+                'Alloc (KB)': round(record.get('alloc_bytes', 0) / 1024, 1)
+            }
+            for record in trace.spans
+        ]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        st.caption(f"Totals exported to {METRICS_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if PROFILE_SECTIONS:
+        run_profiled()
+    else:
+        main()
\ No newline at end of file
@@ -21,4 +21,48 @@ APP_CONFIG = {
     'page_icon': '💼',
     'layout': 'wide',
     'initial_sidebar_state': 'expanded'
-}
\ No newline at end of file
+}
+
+# Data configuration
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE = os.getenv('DATA_FILE', os.path.join(BASE_DIR, 'Financial Statements.csv'))
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'snapshot')
+# Store the ratio columns as float32 (see schema.py); changing it rebuilds the snapshot
+FLOAT32_RATIOS = os.getenv('FLOAT32_RATIOS', '0').lower() in ('1', 'true', 'yes')
+
+# Ingestion configuration
+INCOMING_DIR = os.getenv('INCOMING_DIR', os.path.join(BASE_DIR, 'incoming'))
+PARTITION_DIR = os.path.join(CACHE_DIR, 'partitions')
+INGEST_CHUNK_ROWS = int(os.getenv('INGEST_CHUNK_ROWS', 100000))
+INGEST_POLL_SECONDS = float(os.getenv('INGEST_POLL_SECONDS', 10))
+
+# Shared serving: workers attach to the dataset published by `python shared_dataset.py`
+SHARED_DATASET = os.getenv('SHARED_DATASET', '0').lower() in ('1', 'true', 'yes')
+SHARED_DATASET_DIR = os.path.join(CACHE_DIR, 'shared')
+
+# Cache configuration
+# Shared across processes: 'filesystem' (one file per entry) or 'sqlite' (CACHE_DIR/cache.sqlite)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'filesystem')
+CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', 7 * 24 * 3600))
+FIGURE_CACHE_MB = int(os.getenv('FIGURE_CACHE_MB', 64))
+FIGURE_STORE_MB = int(os.getenv('FIGURE_STORE_MB', 128))
+DATA_STORE_MB = int(os.getenv('DATA_STORE_MB', 512))
+MODEL_STORE_MB = int(os.getenv('MODEL_STORE_MB', 256))
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', 1))
+# Hyperparameters chosen by `python tuning.py`; the defaults are used until it has run
+EPS_PARAMS_FILE = os.getenv('EPS_PARAMS_FILE', os.path.join(CACHE_DIR, 'eps_params.json'))
+AGGREGATE_STORE_MB = int(os.getenv('AGGREGATE_STORE_MB', 128))
+
+# Headless aggregate API (`python api.py`)
+API_HOST = os.getenv('API_HOST', '127.0.0.1')
+API_PORT = int(os.getenv('API_PORT', 8502))
+API_CACHE_MB = int(os.getenv('API_CACHE_MB', 32))
+
+# Chart configuration
+# Row-level charts above this many points switch to WebGL and server-side reduction
+LARGE_CHART_POINTS = int(os.getenv('LARGE_CHART_POINTS', 5000))
+
+# Profiling configuration
+PROFILE_SECTIONS = os.getenv('PROFILE_SECTIONS', '0').lower() in ('1', 'true', 'yes')
+METRICS_FILE = os.getenv('METRICS_FILE', os.path.join(CACHE_DIR, 'metrics.prom'))
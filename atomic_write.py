@@ -0,0 +1,43 @@
+"""
+Atomic file replacement
+
+Manifests, ledgers, stored bundles and reports are read by other processes
+while they are being rewritten. Writers write a temp file next to the target
+and rename it into place, so a reader sees the old or the new contents and
+never a partial file. Temp names are unique per process and thread, so
+concurrent writers never share one, and a failed write removes its temp file.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def replacing(path):
+    """Yield a temp path to write ``path``'s new contents to; rename it over ``path`` when the block succeeds
+
+    A block that removes the temp file leaves ``path`` untouched.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        yield tmp_path
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_text(path, text):
+    """Replace ``path`` with ``text`` atomically"""
+    with replacing(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as handle:
+        handle.write(text)
+
+
+def write_json(path, obj):
+    """Replace ``path`` with ``obj`` as indented JSON atomically"""
+    write_text(path, json.dumps(obj, indent=2))
@@ -0,0 +1,228 @@
+"""
+Memory footprint, groupby time and chart equivalence of the compact schema
+
+For each scale factor, loads the same synthetic CSV in three layouts: the
+original one (object strings, int64 year, float64 everywhere), the compact
+schema (categorical tickers and industries, int16 year) and the compact
+schema with float32 ratios. For each layout it reports the in-memory size
+and times the grouping work of a dashboard view, then rebuilds every cube
+aggregate and chart figure and compares them with the original layout's:
+the compact layout must match exactly, float32 ratios to within ``--rtol``.
+
+    python benchmarks/dtypes.py [--scales 10 1000] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics
+import charts
+import cube
+import data_store
+import derived
+import schema
+from filter_index import FilterIndex
+from pipeline import default_view, isin_filter
+from synthetic import generate
+
+DEFAULT_SCALES = [10, 1000]
+LAYOUTS = {
+    'original': None,
+    'compact': False,
+    'compact+float32': True
+}
+# Median of this many runs per timed stage
+REPEATS = 5
+
+AGGREGATE_CHARTS = {
+    'revenue_by_company': charts.revenue_by_company_chart,
+    'market_cap_by_company': charts.market_cap_chart,
+    'revenue_trend': charts.revenue_trend_chart,
+    'industry_metrics': charts.industry_performance_chart,
+    'employee_counts': charts.employee_chart,
+    'profit_margins': charts.margin_chart,
+    'cash_flow': charts.cash_flow_chart,
+    'growth_by_company': charts.growth_chart,
+    'real_revenue_trend': charts.real_revenue_chart
+}
+ROW_CHARTS = {
+    'roe_roa': charts.roe_roa_chart,
+    'ratio_distribution': charts.ratio_distribution_chart,
+    'eps_trend': charts.eps_trend_chart
+}
+
+
+def load_layout(csv_path, float32):
+    """Parse the CSV into one layout; ``float32=None`` keeps the original dtypes"""
+    df = data_store.normalize_columns(pd.read_csv(csv_path))
+    if float32 is not None:
+        schema.compact(df, float32=float32)
+    return derived.add_derived_metrics(df)
+
+
+def median_seconds(func, *args, **kwargs):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return round(float(np.median(timings)), 6)
+
+
+def time_stages(df):
+    """Time the grouping work of one dashboard view"""
+    companies, year_range, industries = default_view(df)
+    full_cube = cube.build_cube(df)
+    cube_slice = cube.slice_cube(full_cube, companies, year_range, industries)
+    return {
+        'groupby company (row-level means)': median_seconds(
+            lambda: df.groupby('Company', observed=True)[['Revenue', 'ROE', 'ROA']].mean()
+        ),
+        'build_cube': median_seconds(cube.build_cube, df),
+        'filter (isin mask)': median_seconds(isin_filter, df, companies, year_range, industries),
+        'build_filter_index': median_seconds(FilterIndex, df),
+        'slice_cube': median_seconds(cube.slice_cube, full_cube, companies, year_range, industries),
+        'aggregates': median_seconds(analytics.compute_aggregates, cube_slice)
+    }
+
+
+def view_outputs(df):
+    """Return the figures of the dashboard's initial view, keyed by chart"""
+    companies, year_range, industries = default_view(df)
+    aggregates = analytics.compute_aggregates(
+        cube.slice_cube(cube.build_cube(df), companies, year_range, industries)
+    )
+    rows = FilterIndex(df).apply(df, companies, year_range, industries)
+    figures = {name: build(aggregates[name]) for name, build in AGGREGATE_CHARTS.items()}
+    figures.update({name: build(rows) for name, build in ROW_CHARTS.items()})
+    return aggregates['kpis'], aggregates['summary'], figures
+
+
+def max_difference(expected, actual, path='figure'):
+    """Return the largest relative difference between two figure JSON trees
+
+    Raises AssertionError when their structure, strings or array shapes differ.
+    """
+    if isinstance(expected, dict):
+        assert expected.keys() == actual.keys(), f"{path}: keys differ"
+        return max([max_difference(expected[k], actual[k], f'{path}.{k}') for k in expected] or [0.0])
+    if isinstance(expected, (list, tuple, np.ndarray)) or isinstance(actual, (list, tuple, np.ndarray)):
+        expected, actual = np.asarray(expected), np.asarray(actual)
+        assert expected.shape == actual.shape, f"{path}: shape {expected.shape} != {actual.shape}"
+        if expected.dtype.kind in 'fiub' and actual.dtype.kind in 'fiub':
+            return _relative(expected.astype(np.float64), actual.astype(np.float64))
+        return max([max_difference(e, a, f'{path}[]') for e, a in zip(expected.tolist(), actual.tolist())] or [0.0])
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return _relative(np.float64(expected), np.float64(actual))
+    assert expected == actual, f"{path}: {expected!r} != {actual!r}"
+    return 0.0
+
+
+def _relative(expected, actual):
+    same_nan = np.isnan(expected) == np.isnan(actual)
+    assert np.all(same_nan), "NaN positions differ"
+    with np.errstate(invalid='ignore', divide='ignore'):
+        diff = np.abs(expected - actual) / np.maximum(np.abs(expected), 1e-12)
+    diff = diff[~np.isnan(expected)]
+    return float(diff.max()) if diff.size else 0.0
+
+
+def compare(reference, outputs):
+    """Return the largest relative difference of the KPIs, summary and figures"""
+    kpis, summary, figures = outputs
+    worst = max_difference(reference[0], kpis, 'kpis')
+    worst = max(worst, max_difference(
+        reference[1].to_numpy(), summary.to_numpy(), 'summary'
+    ))
+    assert list(reference[1].index) == list(summary.index), "summary: companies differ"
+    for name, figure in figures.items():
+        worst = max(worst, max_difference(reference[2][name].to_plotly_json(), figure.to_plotly_json(), name))
+    return worst
+
+
+def bench_scale(scale, workdir, rtol):
+    """Load every layout at one scale and return its record"""
+    csv_path = os.path.join(workdir, f'synthetic_{scale}.csv')
+    rows = generate(scale, csv_path)
+    record = {'scale': scale, 'rows': rows, 'layouts': {}}
+    reference = None
+    for layout, float32 in LAYOUTS.items():
+        df = load_layout(csv_path, float32)
+        outputs = view_outputs(df)
+        if reference is None:
+            reference = outputs
+            difference = 0.0
+        else:
+            difference = compare(reference, outputs)
+            limit = rtol if float32 else 0.0
+            assert difference <= limit, f"{layout}: outputs differ by {difference:.3g} (limit {limit})"
+        report = schema.memory_report(df)
+        record['layouts'][layout] = {
+            'memory_mb': float(report.loc['Total', 'MB']),
+            'columns_mb': {
+                column: float(report.loc[column, 'MB'])
+                for column in ['Company', 'Industry', 'Year', 'ROE'] if column in report.index
+            },
+            'seconds': time_stages(df),
+            'max_relative_difference': difference
+        }
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the original and compact dataset schemas')
+    parser.add_argument('--scales', type=float, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--rtol', type=float, default=1e-6, help='allowed relative difference with float32 ratios')
+    parser.add_argument('--output', default=None, help='JSON results path (default: benchmarks/results/dtypes-<timestamp>.json)')
+    parser.add_argument('--workdir', default=None, help='where synthetic data is written (default: a temp dir)')
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='dashboard-dtypes-')
+    os.makedirs(workdir, exist_ok=True)
+    started = datetime.now(timezone.utc)
+    try:
+        records = []
+        for scale in args.scales:
+            scale = int(scale) if float(scale).is_integer() else scale
+            record = bench_scale(scale, workdir, args.rtol)
+            records.append(record)
+            print(f"{scale}x: {record['rows']} rows")
+            for layout, result in record['layouts'].items():
+                print(f"  {layout:<16} {result['memory_mb']:>9.1f} MB  "
+                      f"max relative difference {result['max_relative_difference']:.2g}")
+                for stage, seconds in result['seconds'].items():
+                    print(f"    {seconds:>10.4f}s  {stage}")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', 'dtypes-' + started.strftime('%Y%m%dT%H%M%SZ') + '.json'
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump({
+            'started': started.isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'results': records
+        }, handle, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Import-time benchmark for dashboard cold start
+
+Runs ``python -X importtime -c "import app"`` a few times, each right after
+a baseline ``import streamlit``, and reports the slowest top-level imports.
+The budget in import_budget.json covers only what the app adds on top of
+the baseline: the summed self time of the modules that ``import app`` loads
+and the baseline does not. Streamlit's own import time depends on the
+machine and its load, not on this code, so it is left out. The benchmark
+exits non-zero if the median added time exceeds the budget or if any module
+that should be loaded lazily (the scikit-learn stack) was imported.
+
+    python benchmarks/import_time.py [--runs N] [--top N] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(ROOT, 'benchmarks', 'import_budget.json')
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def importtime(module):
+    """Return [(name, self_us, cumulative_us, depth)] for one fresh import"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr)
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def run(budget, runs, top):
+    module = budget['module']
+    totals = []
+    baselines = []
+    added = []
+    for _ in range(runs):
+        baseline = importtime(budget['baseline'])
+        baselines.append(next(cumulative for name, _, cumulative, _ in baseline if name == budget['baseline']) / 1000)
+        entries = importtime(module)
+        totals.append(next(cumulative for name, _, cumulative, _ in entries if name == module) / 1000)
+        in_baseline = {name for name, _, _, _ in baseline}
+        added.append(sum(self_us for name, self_us, _, _ in entries if name not in in_baseline) / 1000)
+    imported = {name for name, _, _, _ in entries}
+    forbidden = sorted(
+        name for name in budget['forbidden']
+        if any(found == name or found.startswith(name + '.') for found in imported)
+    )
+    slowest = sorted(
+        (entry for entry in entries if entry[3] == 1),
+        key=lambda entry: entry[2], reverse=True
+    )[:top]
+    added_ms = statistics.median(added)
+    return {
+        'module': module,
+        'baseline': budget['baseline'],
+        'median_ms': round(statistics.median(totals), 1),
+        'baseline_median_ms': round(statistics.median(baselines), 1),
+        'added_median_ms': round(added_ms, 1),
+        'runs_added_ms': [round(ms, 1) for ms in added],
+        'max_added_ms': budget['max_added_ms'],
+        'forbidden_imported': forbidden,
+        'slowest': [{'module': name, 'cumulative_ms': round(cumulative / 1000, 1)} for name, _, cumulative, _ in slowest],
+        'passed': added_ms <= budget['max_added_ms'] and not forbidden
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='print the machine-readable report')
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE) as handle:
+        budget = json.load(handle)
+    report = run(budget, args.runs, args.top)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {report['module']}: median {report['median_ms']} ms, of which {report['added_median_ms']} ms "
+              f"on top of import {report['baseline']} ({report['baseline_median_ms']} ms); "
+              f"budget {report['max_added_ms']} ms")
+        for entry in report['slowest']:
+            print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+        if report['forbidden_imported']:
+            print(f"Eagerly imported: {', '.join(report['forbidden_imported'])}")
+    sys.exit(0 if report['passed'] else 1)
@@ -0,0 +1,199 @@
+"""
+Synthetic-scale benchmark of the dashboard pipeline
+
+For each scale factor, generates a schema-identical CSV (see synthetic.py)
+and times every stage of a dashboard view: CSV ingest and snapshot load,
+derived metrics, cube and filter index build, the sidebar filter, each chart
+aggregation, the ratio box plot built from the filtered rows, the summary
+formatting and the EPS RandomForest fit. Wall time and the tracemalloc peak
+are recorded per stage and written as JSON. At every scale the indexed
+filter must return exactly the rows of the boolean-mask filter, for the
+dashboard's initial view and a few wider states.
+
+    python benchmarks/pipeline.py [--scales 10 1000] [--output results.json]
+
+100000x writes a multi-GB CSV and needs several GB of RAM; pass it
+explicitly with --scales when the machine allows.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics
+import charts
+import cube
+import data_store
+import derived
+import eps_model
+from filter_index import FilterIndex
+from synthetic import generate
+
+DEFAULT_SCALES = [10, 1000]
+# The EPS fit is capped so large scales measure scaling, not hours of training
+MAX_TRAINING_ROWS = 200_000
+
+
+class StageTimer:
+    """Record wall time and peak traced allocation for named stages"""
+
+    def __init__(self):
+        self.stages = []
+
+    def run(self, name, func, *args, **kwargs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.stages.append({'stage': name, 'seconds': round(elapsed, 6), 'peak_mb': round(peak / 2**20, 3)})
+        return result
+
+
+def default_view(df):
+    """The dashboard's initial filter state for this data"""
+    companies = sorted(df['Company'].unique())[:6]
+    year_range = (2018, int(df['Year'].max()))
+    industries = sorted(df['Industry'].unique())
+    return companies, year_range, industries
+
+
+def isin_filter(df, companies, year_range, industries):
+    """The original boolean-mask filter, kept as a reference stage"""
+    return df[
+        (df['Company'].isin(companies)) &
+        (df['Year'] >= year_range[0]) &
+        (df['Year'] <= year_range[1]) &
+        (df['Industry'].isin(industries))
+    ]
+
+
+def filter_states(df):
+    """The filter states whose index and mask results are compared"""
+    companies = sorted(df['Company'].unique())
+    industries = sorted(df['Industry'].unique())
+    years = (int(df['Year'].min()), int(df['Year'].max()))
+    return [
+        default_view(df),
+        (companies, years, industries),
+        (companies, years, industries[:1]),
+        (companies[::3], (years[1] - 2, years[1]), industries[::2]),
+        (['NO-SUCH-TICKER'], years, industries)
+    ]
+
+
+def check_filter_equivalence(df, index):
+    """Assert that the indexed filter returns the mask filter's rows, in order"""
+    for companies, year_range, industries in filter_states(df):
+        expected = isin_filter(df, companies, year_range, industries)
+        actual = index.apply(df, companies, year_range, industries)
+        assert actual.index.equals(expected.index), (
+            f"index filter differs from the mask for {len(companies)} companies, {year_range}, "
+            f"{len(industries)} industries: {len(actual)} rows vs {len(expected)}"
+        )
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+def bench_scale(scale, workdir):
+    """Run every pipeline stage at one scale and return its record"""
+    csv_path = os.path.join(workdir, f'synthetic_{scale}.csv')
+    snapshot_dir = os.path.join(workdir, f'snapshot_{scale}')
+    generate_start = time.perf_counter()
+    rows = generate(scale, csv_path)
+    generate_seconds = time.perf_counter() - generate_start
+
+    timer = StageTimer()
+    df = timer.run('load_data (cold: parse CSV, write snapshot)', data_store.load_snapshot, csv_path, snapshot_dir)
+    df = timer.run('load_data (warm: memory-map snapshot)', data_store.load_snapshot, csv_path, snapshot_dir)
+    df = timer.run('derived metrics', derived.add_derived_metrics, df)
+    full_cube = timer.run('build_cube', cube.build_cube, df)
+    index = timer.run('build_filter_index', FilterIndex, df)
+
+    companies, year_range, industries = default_view(df)
+    timer.run('filter (isin mask, reference)', isin_filter, df, companies, year_range, industries)
+    filtered_df = timer.run('filter (index)', index.apply, df, companies, year_range, industries)
+    check_filter_equivalence(df, index)
+    cube_slice = timer.run('slice_cube', cube.slice_cube, full_cube, companies, year_range, industries)
+
+    aggregates = {}
+    for name, compute in analytics.AGGREGATES.items():
+        aggregates[name] = timer.run(f'aggregate: {name}', compute, cube_slice)
+    timer.run('chart: ratio_distribution', charts.ratio_distribution_chart, filtered_df)
+    timer.run('format_summary', analytics.format_summary, aggregates['summary'])
+
+    training_rows = filtered_df if len(filtered_df) <= MAX_TRAINING_ROWS else filtered_df.sample(
+        MAX_TRAINING_ROWS, random_state=0
+    )
+    X, y = eps_model.prepare_training_data(training_rows)
+    if len(X) > eps_model.MIN_ROWS:
+        timer.run('train_eps_model', eps_model.train_eps_model, X, y, n_jobs=-1)
+
+    return {
+        'scale': scale,
+        'rows': rows,
+        'companies': int(df['Company'].nunique()),
+        'years': int(df['Year'].nunique()),
+        'filtered_rows': len(filtered_df),
+        'cube_cells': len(full_cube),
+        'csv_mb': round(os.path.getsize(csv_path) / 2**20, 2),
+        'generate_seconds': round(generate_seconds, 3),
+        'stages': timer.stages
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard pipeline at synthetic scales')
+    parser.add_argument('--scales', type=float, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--output', default=None, help='JSON results path (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--workdir', default=None, help='where synthetic data is written (default: a temp dir)')
+    parser.add_argument('--keep', action='store_true', help='keep the synthetic data')
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='dashboard-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    started = datetime.now(timezone.utc)
+    try:
+        records = []
+        for scale in args.scales:
+            scale = int(scale) if float(scale).is_integer() else scale
+            record = bench_scale(scale, workdir)
+            records.append(record)
+            print(f"{scale}x: {record['rows']} rows")
+            for stage in record['stages']:
+                print(f"  {stage['seconds']:>10.4f}s  {stage['peak_mb']:>10.1f} MB  {stage['stage']}")
+    finally:
+        if not args.keep and args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', started.strftime('%Y%m%dT%H%M%SZ') + '.json'
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump({
+            'started': started.isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'results': records
+        }, handle, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
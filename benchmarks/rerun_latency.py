@@ -0,0 +1,77 @@
+"""
+Measure dashboard rerun latency with Streamlit's AppTest harness
+
+Compares a rerun where every section's inputs changed (a new, unseen year
+range), with and without the EPS model section, against a rerun where no
+inputs changed and one where only the model section was switched on. The
+model trains in a background pool, so the stages with the model time every
+rerun until the trained model is shown, not just the rerun that submits it.
+
+    python benchmarks/rerun_latency.py [--repeats N]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+
+def timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return time.perf_counter() - start
+
+
+def training(at):
+    return any(info.value.startswith("Training the EPS model") for info in at.info)
+
+
+def timed_run_until_trained(at, poll_seconds=0.05):
+    """Rerun until the EPS section stops reporting background training; return the total seconds"""
+    start = time.perf_counter()
+    timed_run(at)
+    while training(at):
+        time.sleep(poll_seconds)
+        timed_run(at)
+    return time.perf_counter() - start
+
+
+def measure(repeats):
+    at = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=600)
+    timed_run(at)
+    slider = at.sidebar.slider[0]
+    low, high = int(slider.min), int(slider.max)
+    starts = list(range(low, high - 1))[:repeats]
+
+    results = {'filter_change_with_model': [], 'filter_change': [],
+               'no_inputs_changed': [], 'model_section_only': []}
+    for year in starts:
+        # Every section recomputes, and the model is trained for the new rows before it is shown
+        at.toggle(key='eps_model_enabled').set_value(True)
+        at.sidebar.slider[0].set_value((year, high))
+        results['filter_change_with_model'].append(timed_run_until_trained(at))
+        # New filter state with the model section switched off
+        at.toggle(key='eps_model_enabled').set_value(False)
+        at.sidebar.slider[0].set_value((year, high - 1))
+        results['filter_change'].append(timed_run(at))
+        results['no_inputs_changed'].append(timed_run(at))
+        # Switching the model on only recomputes that section, until its model is trained
+        at.toggle(key='eps_model_enabled').set_value(True)
+        results['model_section_only'].append(timed_run_until_trained(at))
+
+    return {name: round(statistics.median(values) * 1000, 1) for name, values in results.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps({'median_rerun_ms': measure(args.repeats)}, indent=2))
@@ -0,0 +1,80 @@
+"""
+Synthetic, schema-identical financial statements at arbitrary scale
+
+The real CSV is used as a template. A scale factor ``s`` replicates it into
+more companies (renamed tickers, each a noisy copy of a template company)
+and more years (earlier blocks of the template's year span), giving about
+``s`` times the template's rows. Output is written in bounded-memory
+chunks in the original CSV layout, so it goes through the same ingest path.
+
+    python benchmarks/synthetic.py SCALE OUTPUT.csv
+"""
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app_config import DATA_FILE
+
+# Columns that must not be perturbed
+IDENTITY_COLS = ['Year', 'Company ', 'Category', 'Inflation Rate(in US)']
+
+
+def split_scale(scale):
+    """Split a scale factor into (company copies, year blocks)"""
+    year_blocks = max(1, round(scale ** 0.25))
+    company_copies = max(1, math.ceil(scale / year_blocks))
+    return company_copies, year_blocks
+
+
+def generate(scale, output_path, template_path=DATA_FILE, chunk_rows=500_000, seed=0):
+    """Write a synthetic CSV about ``scale`` times the template; return its row count"""
+    template = pd.read_csv(template_path)
+    template.columns = [column.lstrip('\ufeff') for column in template.columns]
+    company_copies, year_blocks = split_scale(scale)
+    span = int(template['Year'].max() - template['Year'].min() + 1)
+    numeric_cols = [
+        column for column in template.columns
+        if column not in IDENTITY_COLS and pd.api.types.is_numeric_dtype(template[column])
+    ]
+    integer_cols = [column for column in numeric_cols if pd.api.types.is_integer_dtype(template[column])]
+    rng = np.random.default_rng(seed)
+
+    # One block = the whole template shifted back by ``block * span`` years
+    blocks_per_chunk = max(1, chunk_rows // len(template))
+    jobs = [(copy, block) for copy in range(company_copies) for block in range(year_blocks)]
+    rows_written = 0
+    with open(output_path, 'w', newline='') as handle:
+        for start in range(0, len(jobs), blocks_per_chunk):
+            batch = jobs[start:start + blocks_per_chunk]
+            chunk = pd.concat([template] * len(batch), ignore_index=True)
+            copies = np.repeat([copy for copy, _ in batch], len(template))
+            blocks = np.repeat([block for _, block in batch], len(template))
+            chunk['Year'] = chunk['Year'].to_numpy() - blocks * span
+            chunk['Company '] = chunk['Company '].str.strip() + np.where(
+                copies == 0, '', pd.Series(copies).astype(str).radd('_').to_numpy()
+            )
+            # Multiplicative noise keeps signs and rough magnitudes realistic
+            noise = rng.lognormal(mean=0.0, sigma=0.15, size=(len(chunk), len(numeric_cols)))
+            values = chunk[numeric_cols].to_numpy(dtype=np.float64) * noise
+            chunk[numeric_cols] = values
+            for column in integer_cols:
+                chunk[column] = chunk[column].round().astype(np.int64)
+            chunk.to_csv(handle, index=False, header=rows_written == 0, float_format='%.4f')
+            rows_written += len(chunk)
+    return rows_written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic financial statements CSV')
+    parser.add_argument('scale', type=float)
+    parser.add_argument('output')
+    args = parser.parse_args()
+    rows = generate(args.scale, args.output)
+    print(f"Wrote {rows} rows to {args.output}")
@@ -0,0 +1,53 @@
+"""
+Thread-safe in-memory LRU with a byte budget
+
+Each entry is stored with its size in bytes; once the sizes add up past the
+budget, the least recently used entries are evicted. An entry larger than
+the whole budget is not stored. Used by the figure cache and the API's
+response cache.
+"""
+import threading
+from collections import OrderedDict
+
+
+class ByteLRU:
+    """LRU of values with caller-supplied sizes, bounded by ``max_bytes``"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the value for ``key`` and mark it recently used, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Insert a value of ``size`` bytes, evicting old entries to stay within budget"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
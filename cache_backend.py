@@ -0,0 +1,153 @@
+"""
+Pluggable cache backends shared across processes
+
+Every cache that outlives a process (models, aggregates, figures and the
+prepared data) is opened through ``open_store``, which returns either the
+filesystem ``ModelStore`` (one file per entry under ``CACHE_DIR``) or
+``SQLiteStore`` (one table in a single SQLite file) depending on
+``CACHE_BACKEND``. Both expose the same get/put/contains/delete/evict
+interface, bound each namespace by a byte budget with least-recently-used
+eviction, drop entries idle for longer than ``CACHE_TTL_SECONDS``, and are
+safe to share between the Streamlit processes of one host or replicas on a
+shared volume, so a cache warmed by one worker serves all of them.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from app_config import CACHE_BACKEND, CACHE_DIR, CACHE_TTL_SECONDS
+from model_store import ModelStore
+
+SQLITE_FILE = 'cache.sqlite'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+'''
+
+
+class SQLiteStore:
+    """One namespace of a SQLite-backed cache of picklable values"""
+
+    def __init__(self, path, namespace, max_bytes, ttl=None):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection per store, shared by the session threads under a lock;
+        # SQLite's own file locking serializes the processes
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(_SCHEMA)
+
+    def _expired(self, accessed):
+        return self.ttl is not None and self.ttl > 0 and accessed < time.time() - self.ttl
+
+    def get(self, key):
+        """Return the stored value for ``key``, or None"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value, accessed FROM entries WHERE namespace = ? AND key = ?', (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1]):
+                self._delete(key)
+                return None
+            self._connection.execute(
+                'UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?', (time.time(), self.namespace, key)
+            )
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            # An entry written by an incompatible version is treated as a miss
+            self.delete(key)
+            return None
+
+    def contains(self, key):
+        """Return whether an unexpired entry exists for ``key``, as ``get`` would find it"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT accessed FROM entries WHERE namespace = ? AND key = ?', (self.namespace, key)
+            ).fetchone()
+        return row is not None and not self._expired(row[0])
+
+    def put(self, key, value):
+        """Store a value and evict old entries past the budget"""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (namespace, key, value, size, accessed) VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, blob, len(blob), time.time())
+            )
+        self.evict()
+
+    def _delete(self, key):
+        self._connection.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def delete(self, key):
+        """Remove the entry for ``key`` if present"""
+        with self._lock:
+            self._delete(key)
+
+    def entries(self):
+        """Return (accessed, size, key) for every entry, oldest first"""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT accessed, size, key FROM entries WHERE namespace = ? ORDER BY accessed', (self.namespace,)
+            ).fetchall()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the namespace fits its budget"""
+        with self._lock:
+            connection = self._connection
+            # BEGIN IMMEDIATE takes the write lock, so concurrent evictions do not interleave
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if self.ttl:
+                    connection.execute(
+                        'DELETE FROM entries WHERE namespace = ? AND accessed < ?',
+                        (self.namespace, time.time() - self.ttl)
+                    )
+                total = connection.execute(
+                    'SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?', (self.namespace,)
+                ).fetchone()[0]
+                if total > self.max_bytes:
+                    victims = []
+                    for size, key in connection.execute(
+                        'SELECT size, key FROM entries WHERE namespace = ? ORDER BY accessed', (self.namespace,)
+                    ):
+                        if total <= self.max_bytes:
+                            break
+                        victims.append((self.namespace, key))
+                        total -= size
+                    connection.executemany('DELETE FROM entries WHERE namespace = ? AND key = ?', victims)
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+
+def open_store(namespace, max_bytes, backend=CACHE_BACKEND, cache_dir=CACHE_DIR, ttl=CACHE_TTL_SECONDS):
+    """Open the shared store for one namespace ('models', 'aggregates', ...)"""
+    ttl = ttl or None
+    if backend == 'sqlite':
+        return SQLiteStore(os.path.join(cache_dir, SQLITE_FILE), namespace, max_bytes, ttl=ttl)
+    if backend == 'filesystem':
+        return ModelStore(os.path.join(cache_dir, namespace), max_bytes, ttl=ttl)
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
@@ -0,0 +1,450 @@
+"""
+Plotly figure builders for the dashboard charts
+
+Each builder takes already-aggregated data (or the filtered rows for the
+row-level charts) and returns a styled figure, so figures can be cached
+independently of the Streamlit script.
+
+The row-level charts switch to a large-data mode above
+``LARGE_CHART_POINTS`` points: the ROE/ROA scatter becomes a binned density
+heatmap and the EPS lines are thinned with LTTB and drawn with WebGL (or,
+for more companies than the point budget can draw, summarised as a median
+and 10-90% band per year), so payload size and render time stay bounded
+however many rows are selected.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from app_config import LARGE_CHART_POINTS
+from downsample import density_grid, lttb
+
+DARK_LAYOUT = {
+    'plot_bgcolor': '#2d2d2d',
+    'paper_bgcolor': '#2d2d2d',
+    'font_color': '#f5f5f5'
+}
+
+
+def _observed(df, column):
+    """Return ``df`` with only the categories of ``column`` that occur in it
+
+    Plotly Express groups a categorical color column by every category, and
+    fails on the ones the filtered rows do not contain.
+    """
+    if isinstance(df[column].dtype, pd.CategoricalDtype):
+        return df.assign(**{column: df[column].cat.remove_unused_categories()})
+    return df
+
+
+def revenue_by_company_chart(revenue_by_company):
+    """Horizontal bar of total revenue per company"""
+    fig = px.bar(
+        x=revenue_by_company.values/1000,
+        y=revenue_by_company.index,
+        orientation='h',
+        template='plotly_dark',
+        color=revenue_by_company.values,
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(
+        height=300,
+        showlegend=False,
+        xaxis_title="Revenue (Billions)",
+        yaxis_title="Company",
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def market_cap_chart(market_cap_by_company):
+    """Pie of average market cap per company"""
+    fig = px.pie(
+        values=market_cap_by_company.values,
+        names=market_cap_by_company.index,
+        template='plotly_dark'
+    )
+    fig.update_layout(height=300, **DARK_LAYOUT)
+    return fig
+
+
+def roe_roa_chart(filtered_df, max_points=LARGE_CHART_POINTS):
+    """Scatter of ROE against ROA for every filtered row, binned when large"""
+    if len(filtered_df) > max_points:
+        return roe_roa_density_chart(filtered_df)
+    fig = px.scatter(
+        _observed(filtered_df, 'Company'),
+        x='ROA',
+        y='ROE',
+        color='Company',
+        # Plotly rejects NaN marker sizes; rows without a market cap get the smallest marker
+        size=filtered_df['Market_Cap'].fillna(0),
+        template='plotly_dark'
+    )
+    fig.update_layout(height=300, **DARK_LAYOUT)
+    return fig
+
+
+def roe_roa_density_chart(filtered_df, bins=80):
+    """Heatmap of how many rows fall in each ROA/ROE cell"""
+    counts, roa, roe = density_grid(filtered_df['ROA'], filtered_df['ROE'], bins=bins)
+    fig = go.Figure(go.Heatmap(
+        x=roa,
+        y=roe,
+        # Empty cells stay transparent instead of drawing the lowest colour
+        z=np.where(counts > 0, counts, np.nan),
+        colorscale='Viridis',
+        colorbar=dict(title='Rows'),
+        hovertemplate='ROA %{x:.1f}<br>ROE %{y:.1f}<br>%{z} rows<extra></extra>'
+    ))
+    fig.update_layout(
+        height=300,
+        template='plotly_dark',
+        xaxis_title='ROA',
+        yaxis_title='ROE',
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def revenue_trend_chart(revenue_time):
+    """Stacked bar of average revenue per year and company"""
+    fig = go.Figure()
+    for company in revenue_time.columns:
+        fig.add_trace(go.Bar(
+            name=company,
+            x=revenue_time.index,
+            y=revenue_time[company]/1000,
+        ))
+
+    fig.update_layout(
+        barmode='stack',
+        height=300,
+        template='plotly_dark',
+        xaxis_title="Year",
+        yaxis_title="Revenue (Billions)",
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def industry_performance_chart(industry_metrics):
+    """Grouped horizontal bar of average revenue and net income per industry"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='Revenue',
+        y=industry_metrics.index,
+        x=industry_metrics['Revenue']/1000,
+        orientation='h',
+        marker_color='#00cc96'
+    ))
+    fig.add_trace(go.Bar(
+        name='Net Income',
+        y=industry_metrics.index,
+        x=industry_metrics['Net_Income']/1000,
+        orientation='h',
+        marker_color='#ef553b'
+    ))
+
+    fig.update_layout(
+        barmode='group',
+        height=300,
+        template='plotly_dark',
+        xaxis_title="Amount (Billions)",
+        yaxis_title="Industry",
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def ratio_distribution_chart(filtered_df):
+    """Box plot of the current and debt/equity ratios"""
+    # One trace per ratio straight from the columns, instead of melting a long copy of the rows
+    color = pio.templates['plotly_dark'].layout.colorway[0]
+    fig = go.Figure([
+        go.Box(y=filtered_df[column].to_numpy(), name=column, marker_color=color, showlegend=False)
+        for column in ['Current_Ratio', 'Debt_Equity_Ratio']
+    ])
+    fig.update_layout(
+        height=300,
+        template='plotly_dark',
+        xaxis_title='Ratio_Type',
+        yaxis_title='Value',
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def employee_chart(employee_data):
+    """Bar of average employee count per company"""
+    fig = px.bar(
+        x=employee_data.index,
+        y=employee_data.values,
+        template='plotly_dark',
+        color=employee_data.values,
+        color_continuous_scale='Blues'
+    )
+    fig.update_layout(
+        height=300,
+        showlegend=False,
+        xaxis_title="Company",
+        yaxis_title="Employees",
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def margin_chart(margin_data):
+    """Horizontal bar of average net profit margin per company"""
+    fig = px.bar(
+        x=margin_data.values,
+        y=margin_data.index,
+        orientation='h',
+        template='plotly_dark',
+        color=margin_data.values,
+        color_continuous_scale='RdYlGn'
+    )
+    fig.update_layout(
+        height=300,
+        showlegend=False,
+        xaxis_title="Net Profit Margin (%)",
+        yaxis_title="Company",
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def eps_trend_chart(filtered_df, max_points=LARGE_CHART_POINTS):
+    """Line chart of earnings per share over time per company"""
+    if len(filtered_df) > max_points:
+        return eps_trend_webgl_chart(filtered_df, max_points)
+    fig = px.line(
+        _observed(filtered_df, 'Company'),
+        x='Year',
+        y='Earning_Per_Share',
+        color='Company',
+        template='plotly_dark',
+        markers=True
+    )
+    fig.update_layout(height=400, **DARK_LAYOUT)
+    return fig
+
+
+def eps_trend_webgl_chart(filtered_df, max_points=LARGE_CHART_POINTS, max_legend=20):
+    """WebGL EPS lines, each company thinned with LTTB to share ``max_points``"""
+    rows = filtered_df[['Company', 'Year', 'Earning_Per_Share']].dropna()
+    groups = rows.groupby('Company', sort=True, observed=True).indices
+    if len(groups) * 3 > max_points:
+        return eps_band_chart(rows)
+    # At least 3 points (first, last and one extreme) per company
+    per_series = max(3, max_points // max(1, len(groups)))
+    years = rows['Year'].to_numpy()
+    eps = rows['Earning_Per_Share'].to_numpy()
+    series = {}
+    for company, positions in groups.items():
+        positions = positions[np.argsort(years[positions], kind='stable')]
+        series[company] = positions[lttb(years[positions], eps[positions], per_series)]
+
+    fig = go.Figure()
+    if len(series) <= max_legend:
+        for company, keep in series.items():
+            fig.add_trace(go.Scattergl(name=str(company), x=years[keep], y=eps[keep], mode='lines'))
+    else:
+        # One trace for every company, broken by gaps, instead of thousands of traces
+        keep = np.concatenate([np.append(positions, -1) for positions in series.values()])
+        gap = keep < 0
+        names = np.concatenate([[str(company)] * (len(positions) + 1) for company, positions in series.items()])
+        fig.add_trace(go.Scattergl(
+            x=np.where(gap, np.nan, years[keep]),
+            y=np.where(gap, np.nan, eps[keep]),
+            text=names,
+            mode='lines',
+            line=dict(width=1),
+            hovertemplate='%{text}<br>%{x}: %{y:.2f}<extra></extra>'
+        ))
+    fig.update_layout(
+        height=400,
+        template='plotly_dark',
+        showlegend=len(series) <= max_legend,
+        xaxis_title='Year',
+        yaxis_title='Earning_Per_Share',
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def eps_band_chart(rows):
+    """Median EPS per year with its 10-90% band, for too many companies to draw"""
+    quantiles = rows.groupby('Year')['Earning_Per_Share'].quantile([0.1, 0.5, 0.9]).unstack()
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=quantiles.index, y=quantiles[0.9], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        name='10-90% of companies', x=quantiles.index, y=quantiles[0.1], mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor='rgba(99, 110, 250, 0.3)'
+    ))
+    fig.add_trace(go.Scatter(name='Median', x=quantiles.index, y=quantiles[0.5], mode='lines+markers'))
+    fig.update_layout(
+        height=400,
+        template='plotly_dark',
+        xaxis_title='Year',
+        yaxis_title='Earning_Per_Share',
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def cash_flow_chart(cash_flow_data):
+    """Grouped bar of average operating, investing and financing cash flow"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='Operating',
+        x=cash_flow_data.index,
+        y=cash_flow_data['Cash_Flow_from_Operating']/1000,
+        marker_color='#00cc96'
+    ))
+    fig.add_trace(go.Bar(
+        name='Investing',
+        x=cash_flow_data.index,
+        y=cash_flow_data['Cash_Flow_from_Investing']/1000,
+        marker_color='#ef553b'
+    ))
+    fig.add_trace(go.Bar(
+        name='Financial',
+        x=cash_flow_data.index,
+        y=cash_flow_data['Cash_Flow_from_Financial_Activities']/1000,
+        marker_color='#ffa15a'
+    ))
+
+    fig.update_layout(
+        barmode='group',
+        height=400,
+        template='plotly_dark',
+        xaxis_title="Company",
+        yaxis_title="Cash Flow (Billions)",
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def growth_chart(growth):
+    """Grouped bar of average YoY revenue growth and 3-year CAGR per company"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='YoY Growth',
+        x=growth.index,
+        y=growth['Revenue_YoY'],
+        marker_color='#636efa'
+    ))
+    fig.add_trace(go.Bar(
+        name='3-Year CAGR',
+        x=growth.index,
+        y=growth['Revenue_CAGR_3Y'],
+        marker_color='#00cc96'
+    ))
+
+    fig.update_layout(
+        barmode='group',
+        height=300,
+        template='plotly_dark',
+        xaxis_title="Company",
+        yaxis_title="Revenue Growth (%)",
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def real_revenue_chart(revenue_trend):
+    """Line chart of total nominal against inflation-adjusted revenue per year"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        name='Nominal',
+        x=revenue_trend.index,
+        y=revenue_trend['Revenue']/1000,
+        mode='lines+markers'
+    ))
+    fig.add_trace(go.Scatter(
+        name='Real',
+        x=revenue_trend.index,
+        y=revenue_trend['Real_Revenue']/1000,
+        mode='lines+markers'
+    ))
+
+    fig.update_layout(
+        height=300,
+        template='plotly_dark',
+        xaxis_title="Year",
+        yaxis_title="Revenue (Billions)",
+        **DARK_LAYOUT
+    )
+    return fig
+
+
+def feature_importance_chart(feature_importance, selected_features):
+    """Horizontal bar of the EPS model's feature importances"""
+    fig = px.bar(
+        x=feature_importance,
+        y=selected_features,
+        orientation='h',
+        title='Feature Importance for EPS Prediction',
+        template='plotly_dark'
+    )
+    fig.update_layout(**DARK_LAYOUT)
+    return fig
+
+
+def cluster_chart(profiles, centroids):
+    """Scatter of company ROE/ROA profiles coloured by cluster, with centroids"""
+    fig = px.scatter(
+        profiles.reset_index(),
+        x='ROA',
+        y='ROE',
+        color=profiles['Cluster'].astype(str).to_numpy(),
+        hover_name='Company',
+        template='plotly_dark',
+        labels={'color': 'Cluster'}
+    )
+    fig.add_trace(go.Scatter(
+        name='Centroids',
+        x=centroids['ROA'],
+        y=centroids['ROE'],
+        mode='markers',
+        marker=dict(symbol='x', size=12, color='#f5f5f5')
+    ))
+    fig.update_layout(height=400, **DARK_LAYOUT)
+    return fig
+
+
+def company_map_chart(df, coords, selected):
+    """WebGL scatter of the t-SNE company map, highlighting the selected rows"""
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        name='Other',
+        x=coords[~selected, 0],
+        y=coords[~selected, 1],
+        mode='markers',
+        marker=dict(size=4, color='#555555'),
+        hoverinfo='skip'
+    ))
+    highlighted = df[selected]
+    for industry, rows in highlighted.groupby('Industry', sort=True, observed=True).indices.items():
+        fig.add_trace(go.Scattergl(
+            name=str(industry),
+            x=coords[selected][rows, 0],
+            y=coords[selected][rows, 1],
+            mode='markers',
+            marker=dict(size=7),
+            text=highlighted['Company'].to_numpy()[rows] + ' ' + highlighted['Year'].astype(str).to_numpy()[rows],
+            hoverinfo='text'
+        ))
+    fig.update_layout(
+        height=450,
+        template='plotly_dark',
+        xaxis=dict(showticklabels=False, title=None),
+        yaxis=dict(showticklabels=False, title=None),
+        **DARK_LAYOUT
+    )
+    return fig
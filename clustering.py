@@ -0,0 +1,57 @@
+"""
+Company clustering on scaled financial-ratio profiles
+
+Each company is summarised by its mean ratios, rolled up from the aggregate
+cube. Profiles are scaled with a RobustScaler (ratios have heavy tails) and
+grouped with mini-batch K-means, which stays fast with thousands of
+companies. The fitted model is computed once per data version; filter
+changes only re-profile the selected companies and call ``predict``.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import RobustScaler
+
+import cube
+
+PROFILE_COLS = ['ROE', 'ROA', 'ROI', 'Net_Profit_Margin', 'Debt_Equity_Ratio', 'Current_Ratio']
+
+
+def company_profiles(cube_slice, profile_cols=PROFILE_COLS):
+    """Return one row of mean ratios per company in the cube slice"""
+    return cube.rollup(cube_slice, 'Company', profile_cols)
+
+
+def fit_clusters(profiles, n_clusters, random_state=42, batch_size=1024):
+    """Fit the scaler and mini-batch K-means on company profiles"""
+    fill_values = profiles.median()
+    scaler = RobustScaler()
+    scaled = scaler.fit_transform(profiles.fillna(fill_values))
+    n_clusters = max(1, min(n_clusters, len(profiles)))
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters,
+        batch_size=batch_size,
+        n_init=3,
+        random_state=random_state
+    )
+    labels = kmeans.fit_predict(scaled)
+    centroids = pd.DataFrame(
+        scaler.inverse_transform(kmeans.cluster_centers_),
+        columns=profiles.columns
+    )
+    centroids.index.name = 'Cluster'
+    return {
+        'scaler': scaler,
+        'kmeans': kmeans,
+        'fill_values': fill_values,
+        'centroids': centroids,
+        'assignments': pd.Series(labels, index=profiles.index, name='Cluster')
+    }
+
+
+def assign_clusters(model, profiles):
+    """Assign (re-profiled) companies to the fitted clusters"""
+    if profiles.empty:
+        return pd.Series(dtype=np.int32, name='Cluster')
+    scaled = model['scaler'].transform(profiles.fillna(model['fill_values']))
+    return pd.Series(model['kmeans'].predict(scaled), index=profiles.index, name='Cluster')
@@ -0,0 +1,94 @@
+"""
+Pre-aggregated (Company, Year, Industry) cube for the dashboard charts
+
+The cube holds the sum and non-null count of every numeric measure per
+(Company, Year, Industry) cell. Any mean or sum over a filter that selects
+whole cells can be rolled up exactly from those two numbers, so the charts
+never have to scan the row-level data.
+"""
+import numpy as np
+import pandas as pd
+
+import schema
+
+DIMENSIONS = ['Company', 'Year', 'Industry']
+
+
+def measure_columns(df):
+    """Return the numeric columns that can be aggregated"""
+    return [
+        column for column in df.columns
+        if column not in DIMENSIONS and pd.api.types.is_numeric_dtype(df[column].dtype)
+    ]
+
+
+def build_cube(df):
+    """Aggregate the row-level data into one row per (Company, Year, Industry)"""
+    measures = measure_columns(df)
+    grouped = df.groupby(DIMENSIONS, dropna=False, sort=True, observed=True)[measures]
+    sums = grouped.sum().add_suffix('_sum')
+    counts = grouped.count().add_suffix('_count')
+    cube = pd.concat([sums, counts], axis=1).reset_index()
+    cube['Rows'] = grouped.size().to_numpy()
+    for measure in measures:
+        cube[f'{measure}_mean'] = _safe_mean(cube[f'{measure}_sum'], cube[f'{measure}_count'])
+    return cube
+
+
+def replace_companies(cube, companies, company_cube):
+    """Swap the cells of ``companies`` for ``company_cube``, their rebuilt cells
+
+    Every other cell is carried over unchanged; with ``company_cube`` built
+    from all rows of those companies the result equals ``build_cube`` over
+    the whole frame.
+    """
+    keep = ~cube['Company'].isin(companies)
+    return (
+        schema.concat([cube[keep], company_cube[cube.columns]])
+        .sort_values(DIMENSIONS, kind='stable', ignore_index=True)
+    )
+
+
+def _safe_mean(sums, counts):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def slice_cube(cube, companies, year_range, industries):
+    """Return the cube cells matching the sidebar filters"""
+    mask = (
+        cube['Company'].isin(companies) &
+        (cube['Year'] >= year_range[0]) &
+        (cube['Year'] <= year_range[1]) &
+        cube['Industry'].isin(industries)
+    )
+    return cube[mask]
+
+
+def rollup(cube, by, measures, how='mean'):
+    """Roll the cube up to the ``by`` dimensions
+
+    ``how`` is either 'sum' or 'mean'; the result has one column per measure,
+    matching ``df.groupby(by)[measures].agg(how)`` on the underlying rows.
+    """
+    columns = [f'{measure}_sum' for measure in measures]
+    if how == 'mean':
+        columns += [f'{measure}_count' for measure in measures]
+    grouped = cube.groupby(by, sort=True, observed=True)[columns].sum()
+    if how == 'sum':
+        return grouped.rename(columns=lambda column: column[:-len('_sum')])
+    if how != 'mean':
+        raise ValueError(f"Unsupported rollup: {how}")
+    result = pd.DataFrame(index=grouped.index)
+    for measure in measures:
+        result[measure] = _safe_mean(grouped[f'{measure}_sum'], grouped[f'{measure}_count'])
+    return result
+
+
+def total(cube, measure, how='mean'):
+    """Return the sum or mean of a measure over all cells of the cube"""
+    measure_sum = cube[f'{measure}_sum'].sum()
+    if how == 'sum':
+        return measure_sum
+    count = cube[f'{measure}_count'].sum()
+    return measure_sum / count if count else np.nan
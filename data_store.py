@@ -0,0 +1,261 @@
+"""
+Columnar snapshot store for the financial dataset
+
+The source CSV is parsed and normalized once, then written as a bundle of
+NumPy ``.npy`` files (one per column) plus a JSON manifest. Later loads
+memory-map the bundle instead of re-parsing the CSV, and the bundle is only
+rebuilt when the source file's size, mtime or content hash changes.
+Concurrent cold starts rebuild it once, under a file lock, and a bundle is
+written to a temporary directory and renamed into place, so readers never
+map a half-written column.
+
+Columns are stored in the compact dtypes of schema.py; tickers and
+industries come back as categoricals over the memory-mapped codes.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import atomic_write
+import schema
+from file_lock import FileLock
+
+SNAPSHOT_FORMAT = 2
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.lock'
+# Inside each bundle: its row count and column specs, so the bundle can be reused without parsing the CSV
+BUNDLE_INFO_NAME = 'bundle.json'
+
+COLUMN_RENAMES = {
+    'Company ': 'Company',
+    'Market Cap(in B USD)': 'Market_Cap',
+    'Category': 'Industry',
+    'Inflation Rate(in US)': 'Inflation_Rate'
+}
+
+
+def normalize_columns(df):
+    """Clean, rename and snake_case the raw CSV columns"""
+    df.columns = df.columns.str.strip()
+    df.rename(columns=COLUMN_RENAMES, inplace=True)
+    df.columns = df.columns.str.replace(' ', '_').str.replace('/', '_')
+    return df
+
+
+def read_source(csv_path, float32=False):
+    """Parse the source CSV into the normalized frame with the compact dtypes"""
+    return schema.compact(normalize_columns(pd.read_csv(csv_path)), float32=float32)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the sha256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """Return the cheap (size, mtime) fingerprint of a file"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_manifest(snapshot_dir):
+    """Return the snapshot manifest, or None if there is no usable snapshot"""
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME)) as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        return None
+    return manifest
+
+
+def _write_manifest(snapshot_dir, manifest):
+    atomic_write.write_json(os.path.join(snapshot_dir, MANIFEST_NAME), manifest)
+
+
+def write_bundle(df, bundle_dir):
+    """Write a frame as one .npy file per column and return the column specs
+
+    Numeric columns are stored as-is so they can be memory-mapped. String
+    columns are dictionary-encoded into integer codes plus a category list.
+    """
+    os.makedirs(bundle_dir, exist_ok=True)
+    columns = []
+    for position, name in enumerate(df.columns):
+        series = df[name]
+        file_name = f'{position:03d}.npy'
+        spec = {'name': name, 'file': file_name}
+        if pd.api.types.is_numeric_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.to_numpy()
+            spec['kind'] = 'numeric'
+        else:
+            categorical = pd.Categorical(series)
+            values = categorical.codes
+            spec['kind'] = 'category'
+            spec['categories'] = [str(category) for category in categorical.categories]
+        np.save(os.path.join(bundle_dir, file_name), values, allow_pickle=False)
+        spec['dtype'] = str(values.dtype)
+        columns.append(spec)
+    return columns
+
+
+def read_bundle(bundle_dir, columns):
+    """Open a bundle written by write_bundle without copying any column"""
+    data = {}
+    for spec in columns:
+        values = np.load(os.path.join(bundle_dir, spec['file']), mmap_mode='r', allow_pickle=False).view(np.ndarray)
+        if spec['kind'] == 'category':
+            # Code -1 is a missing value, as in pandas
+            values = pd.Categorical.from_codes(values, categories=spec['categories'])
+        data[spec['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _version(sha256, float32):
+    # float32 ratios give (slightly) different results, so they must not share cache entries
+    return sha256[:16] + ('-f32' if float32 else '')
+
+
+def bundle_name(sha256, float32):
+    """Return the bundle directory of a source digest, ratio dtype and snapshot format"""
+    return f'{_version(sha256, float32)}-v{SNAPSHOT_FORMAT}'
+
+
+def _read_bundle_info(bundle_dir):
+    try:
+        with open(os.path.join(bundle_dir, BUNDLE_INFO_NAME)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _point_manifest(snapshot_dir, source, float32, info):
+    name = bundle_name(source['sha256'], float32)
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'bundle': name,
+        'rows': info['rows'],
+        'columns': info['columns'],
+        'float32': float32,
+        'source': source
+    }
+    _write_manifest(snapshot_dir, manifest)
+    # Both dtypes of the current source stay, so switching FLOAT32_RATIOS never
+    # rebuilds a bundle other processes have mapped. Bundles of older sources
+    # stay readable for processes that still have them mapped; unlinking only
+    # drops the directory entry.
+    keep = {bundle_name(source['sha256'], False), bundle_name(source['sha256'], True)}
+    for entry in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, entry)
+        if entry not in keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+    return manifest
+
+
+def write_snapshot(df, snapshot_dir, source, float32=False):
+    """Persist a normalized frame and point the manifest at it
+
+    An existing bundle for the same source, dtype and format is reused as
+    it is: bundles are never written in place, since other processes may
+    have their columns memory-mapped.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    bundle_dir = os.path.join(snapshot_dir, bundle_name(source['sha256'], float32))
+    info = _read_bundle_info(bundle_dir)
+    if info is None:
+        # Written aside and renamed into place, so no reader ever maps a half-written column
+        tmp_dir = f'{bundle_dir}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        info = {'rows': len(df), 'columns': write_bundle(df, tmp_dir)}
+        with open(os.path.join(tmp_dir, BUNDLE_INFO_NAME), 'w') as handle:
+            json.dump(info, handle)
+        # Without its info file the directory is the leftover of an interrupted rename
+        shutil.rmtree(bundle_dir, ignore_errors=True)
+        os.replace(tmp_dir, bundle_dir)
+    return _point_manifest(snapshot_dir, source, float32, info)
+
+
+def _usable_manifest(snapshot_dir, float32):
+    manifest = read_manifest(snapshot_dir)
+    if manifest is not None and not os.path.isdir(os.path.join(snapshot_dir, manifest['bundle'])):
+        return None
+    if manifest is not None and manifest.get('float32', False) != float32:
+        return None
+    return manifest
+
+
+def _unchanged(manifest, fingerprint):
+    source = manifest['source']
+    return source['size'] == fingerprint['size'] and source['mtime_ns'] == fingerprint['mtime_ns']
+
+
+def ensure_snapshot(csv_path, snapshot_dir, float32=False):
+    """Return an up-to-date manifest, rebuilding the snapshot only if needed"""
+    fingerprint = file_fingerprint(csv_path)
+    manifest = _usable_manifest(snapshot_dir, float32)
+    if manifest is not None and _unchanged(manifest, fingerprint):
+        return manifest
+    # One process rebuilds; the others wait and then find its manifest
+    with FileLock(os.path.join(snapshot_dir, LOCK_NAME)):
+        manifest = _usable_manifest(snapshot_dir, float32)
+        if manifest is not None and _unchanged(manifest, fingerprint):
+            return manifest
+        return _rebuild(csv_path, snapshot_dir, float32, manifest, fingerprint)
+
+
+def _rebuild(csv_path, snapshot_dir, float32, manifest, fingerprint):
+    digest = file_digest(csv_path)
+    if manifest is not None and digest == manifest['source']['sha256']:
+        # Touched but unchanged: refresh the cheap fingerprint only
+        manifest['source'] = dict(fingerprint, sha256=digest)
+        _write_manifest(snapshot_dir, manifest)
+        return manifest
+    source = dict(fingerprint, sha256=digest)
+    info = _read_bundle_info(os.path.join(snapshot_dir, bundle_name(digest, float32)))
+    if info is not None:
+        # Built earlier for this source and dtype, e.g. before FLOAT32_RATIOS was switched
+        return _point_manifest(snapshot_dir, source, float32, info)
+    return write_snapshot(read_source(csv_path, float32), snapshot_dir, source, float32)
+
+
+def load_snapshot(csv_path, snapshot_dir, float32=False):
+    """Load the normalized frame, memory-mapped from the snapshot"""
+    manifest = ensure_snapshot(csv_path, snapshot_dir, float32)
+    return read_bundle(os.path.join(snapshot_dir, manifest['bundle']), manifest['columns'])
+
+
+def manifest_version(manifest):
+    """Return the data version of the bundle a manifest points at"""
+    return _version(manifest['source']['sha256'], manifest.get('float32', False))
+
+
+def data_version(snapshot_dir):
+    """Return an identifier that changes whenever the snapshot is rebuilt"""
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return None
+    return manifest_version(manifest)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from app_config import DATA_FILE, FLOAT32_RATIOS, SNAPSHOT_DIR
+
+    parser = argparse.ArgumentParser(description='Build the columnar snapshot of the dataset')
+    parser.add_argument('--memory', action='store_true', help='print the in-memory size of each column')
+    args = parser.parse_args()
+
+    manifest = ensure_snapshot(DATA_FILE, SNAPSHOT_DIR, FLOAT32_RATIOS)
+    print(f"Snapshot {manifest['bundle']}: {manifest['rows']} rows, {len(manifest['columns'])} columns")
+    if args.memory:
+        print(schema.memory_report(load_snapshot(DATA_FILE, SNAPSHOT_DIR, FLOAT32_RATIOS)).to_string())
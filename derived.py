@@ -0,0 +1,86 @@
+"""
+Derived metrics computed once after the data is loaded
+
+Year-over-year growth, three-year CAGR and inflation-adjusted (real) values
+are added as ordinary columns, so the aggregate cube, the charts and the EPS
+model can use them like any other measure. Per-company shifts are done on
+one (Company, Year) sort of the whole frame instead of a groupby per chart.
+
+Growth is only defined between consecutive years (or exactly three years
+apart for the CAGR) of the same company; gaps give NaN. Real values are in
+``base_year`` dollars, deflated with the cumulative ``Inflation_Rate``.
+"""
+import numpy as np
+import pandas as pd
+
+GROWTH_COLS = ['Revenue', 'Net_Income']
+DERIVED_COLS = ['Revenue_YoY', 'Net_Income_YoY', 'Revenue_CAGR_3Y', 'Real_Revenue', 'Real_Net_Income']
+
+
+def inflation_rates(df, known=None):
+    """Return year -> inflation rate, keeping the ``known`` rates for years already seen"""
+    rates = df.groupby('Year')['Inflation_Rate'].median()
+    return rates if known is None else known.combine_first(rates)
+
+
+def price_index(rates, base_year):
+    """Return year -> price level relative to ``base_year`` (1.0 in the base year)
+
+    ``rates`` is the US inflation over each year, in percent; years without a
+    rate are treated as flat.
+    """
+    years = np.arange(min(rates.index.min(), base_year), max(rates.index.max(), base_year) + 1)
+    rates = rates.reindex(years).fillna(0.0)
+    level = np.cumprod(1 + rates.to_numpy(dtype=np.float64) / 100)
+    index = pd.Series(level, index=years)
+    return index / index[base_year]
+
+
+def _previous(values, order, sorted_companies, sorted_years, gap):
+    """Return each row's value from ``gap`` years earlier for the same company, else NaN"""
+    sorted_values = values[order]
+    valid = (
+        (sorted_companies[gap:] == sorted_companies[:-gap]) &
+        (sorted_years[gap:] - sorted_years[:-gap] == gap)
+    )
+    result = np.full(len(values), np.nan)
+    result[order[gap:]] = np.where(valid, sorted_values[:-gap], np.nan)
+    return result
+
+
+def derived_metrics(df, prices):
+    """Return the DERIVED_COLS for the rows of ``df``, which must hold every row of its companies"""
+    companies = pd.factorize(df['Company'])[0]
+    years = df['Year'].to_numpy(dtype=np.int64)
+    order = np.lexsort((years, companies))
+    shift = (order, companies[order], years[order])
+    result = {}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for column in GROWTH_COLS:
+            values = df[column].to_numpy(dtype=np.float64)
+            previous = _previous(values, *shift, gap=1)
+            result[f'{column}_YoY'] = np.where(previous != 0, (values - previous) / np.abs(previous) * 100, np.nan)
+
+        revenue = df['Revenue'].to_numpy(dtype=np.float64)
+        previous = _previous(revenue, *shift, gap=3)
+        # Compound growth is only meaningful between positive values
+        positive = (previous > 0) & (revenue > 0)
+        result['Revenue_CAGR_3Y'] = np.where(positive, ((revenue / previous) ** (1 / 3) - 1) * 100, np.nan)
+
+    deflator = 1 / prices.reindex(years).to_numpy()
+    for column in GROWTH_COLS:
+        result[f'Real_{column}'] = df[column].to_numpy(dtype=np.float64) * deflator
+    return pd.DataFrame(result, index=df.index)[DERIVED_COLS]
+
+
+def add_derived_metrics(df, base_year=None, prices=None):
+    """Add the DERIVED_COLS to ``df`` in place and return it"""
+    if base_year is None:
+        base_year = int(df['Year'].max())
+    if prices is None:
+        prices = price_index(inflation_rates(df), base_year)
+    metrics = derived_metrics(df, prices)
+    for column in DERIVED_COLS:
+        df[column] = metrics[column].to_numpy()
+    return df
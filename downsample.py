@@ -0,0 +1,75 @@
+"""
+Server-side reduction of large chart inputs
+
+Charts over many rows ship every point to the browser. ``lttb`` thins a
+time series to a fixed number of points while keeping its visual shape
+(Largest-Triangle-Three-Buckets), and ``density_grid`` bins a scatter into
+a fixed-size 2-D histogram, so the payload no longer grows with the data.
+"""
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """Return the sorted indices of ``n_out`` points that preserve the shape of y(x)
+
+    ``x`` must be sorted ascending. Series with at most ``n_out`` points are
+    returned whole.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n_points = len(x)
+    if n_out >= n_points or n_out < 3:
+        return np.arange(n_points)
+
+    # First and last points are kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n_points - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n_points - 1
+    selected = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n_points - 1, n_points
+        # The candidate forming the largest triangle with the previously
+        # selected point and the next bucket's average wins
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[selected] - average_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (average_y - y[selected])
+        )
+        selected = start + int(np.argmax(area))
+        indices[bucket + 1] = selected
+    return indices
+
+
+def density_grid(x, y, bins=80, clip=0.5):
+    """Bin (x, y) into a ``bins`` x ``bins`` count grid
+
+    Returns ``(counts, x_centers, y_centers)`` with ``counts`` indexed
+    [y, x]. The bin range spans the ``clip`` to ``100 - clip`` percentiles, so
+    a few extreme outliers do not squeeze the bulk of the data into one cell;
+    points beyond it are counted in the edge bins, so every finite point is
+    counted once.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if len(x) == 0:
+        return np.zeros((bins, bins), dtype=np.int64), np.zeros(bins), np.zeros(bins)
+    x_range = np.percentile(x, [clip, 100 - clip])
+    y_range = np.percentile(y, [clip, 100 - clip])
+    # Degenerate ranges would give zero-width bins
+    x_range[1] = max(x_range[1], x_range[0] + 1e-9)
+    y_range[1] = max(y_range[1], y_range[0] + 1e-9)
+    # histogram2d silently drops points outside its range
+    x = np.clip(x, *x_range)
+    y = np.clip(y, *y_range)
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=[x_range, y_range])
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    return counts.T.astype(np.int64), x_centers, y_centers
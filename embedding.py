@@ -0,0 +1,72 @@
+"""
+2-D t-SNE "company map" of the financial rows
+
+Every company-year row is embedded from the same feature columns the EPS
+model uses. Exact t-SNE is quadratic, so at most ``max_points`` rows are
+embedded with Barnes-Hut t-SNE (PCA initialisation); the remaining rows are
+placed by distance-weighted nearest neighbours among the embedded sample.
+The embedding only depends on the data, so it is computed once per data
+version and persisted; filter changes just re-highlight points.
+"""
+import numpy as np
+from sklearn.manifold import TSNE
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.preprocessing import StandardScaler
+
+from eps_model import FEATURE_COLS
+
+MAX_POINTS = 5000
+
+
+def embedding_features(df, feature_cols=FEATURE_COLS):
+    """Return standardized, log-compressed features for the embedding"""
+    X = df[feature_cols].fillna(0).to_numpy(dtype=np.float64)
+    # Signed log keeps the sign of losses while compressing magnitudes
+    return StandardScaler().fit_transform(np.sign(X) * np.log1p(np.abs(X)))
+
+
+def embed(df, feature_cols=FEATURE_COLS, max_points=MAX_POINTS, random_state=42):
+    """Return an (n_rows, 2) float32 embedding of the rows of ``df``"""
+    X = embedding_features(df, feature_cols)
+    n_rows = len(X)
+    if n_rows < 3:
+        return np.zeros((n_rows, 2), dtype=np.float32)
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(n_rows, size=min(n_rows, max_points), replace=False))
+    tsne = TSNE(
+        n_components=2,
+        method='barnes_hut',
+        init='pca',
+        perplexity=min(30.0, (len(sample) - 1) / 3),
+        random_state=random_state
+    )
+    coords = np.empty((n_rows, 2), dtype=np.float32)
+    coords[sample] = tsne.fit_transform(X[sample])
+    if len(sample) < n_rows:
+        rest = np.setdiff1d(np.arange(n_rows), sample, assume_unique=True)
+        neighbours = KNeighborsRegressor(n_neighbors=min(5, len(sample)), weights='distance')
+        neighbours.fit(X[sample], coords[sample])
+        coords[rest] = neighbours.predict(X[rest])
+    return coords
+
+
+def load_or_embed(df, store, data_version, **kwargs):
+    """Return the persisted embedding for ``data_version``, computing it on a miss"""
+    key = f"tsne-{data_version}"
+    coords = store.get(key)
+    if coords is None or len(coords) != len(df):
+        coords = embed(df, **kwargs)
+        store.put(key, coords)
+    return coords
+
+
+if __name__ == '__main__':
+    from app_config import MODEL_STORE_MB
+    from cache_backend import open_store
+    from shared_dataset import open_dataset
+
+    # The rows the dashboard reads, under the version it looks up
+    data = open_dataset().current()
+    store = open_store('models', MODEL_STORE_MB * 1024 * 1024)
+    coords = load_or_embed(data.frame, store, data.version)
+    print(f"Embedded {len(coords)} rows of version {data.version}")
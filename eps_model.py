@@ -0,0 +1,239 @@
+"""
+EPS performance classifier used by the Machine Learning section
+
+Rows are labelled by whether their EPS is above the median of the training
+rows. A random forest inside SelectFromModel picks the features, then a
+second, shallower forest is trained on a hold-out split of those features.
+When a selection only grows a little, the previous forest can be extended
+with warm-started trees fitted on the added rows instead of refitting.
+"""
+import copy
+import hashlib
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_selection import SelectFromModel
+from sklearn.model_selection import train_test_split
+
+from derived import DERIVED_COLS
+
+FEATURE_COLS = ['Market_Cap', 'Revenue', 'Gross_Profit', 'Net_Income', 'EBITDA',
+                'ROE', 'ROA', 'ROI', 'Current_Ratio', 'Debt_Equity_Ratio']
+
+# Adds the growth rates and inflation-adjusted values from derived.py
+GROWTH_FEATURE_COLS = FEATURE_COLS + DERIVED_COLS
+
+# Feature sets hyperparameters are tuned for (see tuning.py)
+FEATURE_SETS = {'base': FEATURE_COLS, 'growth': GROWTH_FEATURE_COLS}
+
+DEFAULT_PARAMS = {
+    'selector': {'n_estimators': 100, 'random_state': 42},
+    'model': {'n_estimators': 100, 'max_depth': 5, 'random_state': 42},
+    'test_size': 0.3,
+    'split_random_state': 42
+}
+
+MIN_ROWS = 10
+
+# Store entry pointing at the most recently stored model (see store_result)
+LATEST_ALIAS = 'eps-latest'
+
+# When a larger selection may be folded into the previous model instead of refitting
+INCREMENTAL_LIMITS = {
+    'max_added_fraction': 0.25,  # added rows relative to the previous training rows
+    'max_label_drift': 0.05,     # share of previous rows whose above-median label flipped
+    'max_tree_growth': 2.0       # refit once the forest doubles its configured size
+}
+
+
+def load_tuned_params(path, feature_set='base'):
+    """Return (params, search summary) tuned for a feature set, or (DEFAULT_PARAMS, None)"""
+    try:
+        with open(path) as handle:
+            tuned = json.load(handle)[feature_set]
+    except (OSError, ValueError, KeyError):
+        return DEFAULT_PARAMS, None
+    return tuned['params'], tuned
+
+
+def prepare_training_data(filtered_df, feature_cols=FEATURE_COLS):
+    """Return the feature matrix and the above-median EPS target"""
+    # Create binary target based on EPS median
+    eps = filtered_df['Earning_Per_Share']
+    # np.nanmedian, as Series.median writes into read-only (memory-mapped) columns
+    y = (eps > np.nanmedian(eps.to_numpy(dtype=np.float64))).astype(int).rename('EPS_Performance')
+    X = filtered_df[feature_cols].fillna(0)
+    return X, y
+
+
+def training_key(X, y, feature_cols, params):
+    """Hash the training rows, feature list and hyperparameters"""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    digest.update(json.dumps([list(feature_cols), params], sort_keys=True).encode())
+    return digest.hexdigest()[:32]
+
+
+def incremental_key(key, previous_key):
+    """Return the key of the model grown from ``previous_key``'s model onto the rows of ``key``
+
+    A warm-started forest differs from a full fit on the same rows, and from
+    one grown from another starting model, so it is never stored under
+    ``training_key``; the previous key carries its whole lineage.
+    """
+    return hashlib.sha256(json.dumps(['incremental', key, previous_key]).encode()).hexdigest()[:32]
+
+
+def train_eps_model(X, y, feature_cols=FEATURE_COLS, params=DEFAULT_PARAMS, n_jobs=None):
+    """Fit the selector and final model and return them with their metrics
+
+    ``n_jobs`` only controls parallelism and is not part of the model key;
+    the fitted forests are identical for any value.
+    """
+    # Feature selection using Random Forest
+    selector = SelectFromModel(RandomForestClassifier(**params['selector'], n_jobs=n_jobs))
+    selector.fit(X, y)
+    X_selected = selector.transform(X)
+
+    # Train final model
+    train_pos, test_pos = _split(len(X), params)
+    final_model = RandomForestClassifier(**params['model'], n_jobs=n_jobs)
+    final_model.fit(X_selected[train_pos], y.iloc[train_pos])
+
+    support = selector.get_support()
+    return {
+        'selector': selector,
+        'model': final_model,
+        'feature_cols': list(feature_cols),
+        'params': params,
+        'mode': 'full',
+        'accuracy': final_model.score(X_selected[test_pos], y.iloc[test_pos]),
+        'feature_importance': final_model.feature_importances_,
+        'selected_features': [feature_cols[i] for i in range(len(feature_cols)) if support[i]],
+        # Kept so a later, larger selection can be folded in incrementally
+        'row_ids': X.index.to_numpy(),
+        'labels': y.to_numpy(dtype=np.int8),
+        'test_ids': X.index.to_numpy()[test_pos]
+    }
+
+
+def _split(n_rows, params):
+    # Same shuffle as train_test_split(X, y, ...) for any arrays of n_rows
+    return train_test_split(
+        np.arange(n_rows), test_size=params['test_size'], random_state=params['split_random_state']
+    )
+
+
+def plan_update(previous, X, y, limits=INCREMENTAL_LIMITS):
+    """Return the positions of the rows to fold into ``previous``, or None
+
+    An incremental update is only possible when the new rows are a superset
+    of the previous training rows, the added share stays under the limit,
+    few previous labels flipped (the median threshold moves as rows are
+    added) and the forest has not already grown past its cap. Otherwise the
+    caller must fall back to a full refit.
+    """
+    if previous is None or previous.get('params') is None:
+        return None
+    if list(previous['feature_cols']) != list(X.columns):
+        return None
+    row_ids = X.index.to_numpy()
+    previous_rows = pd.Index(previous['row_ids'])
+    if not previous_rows.isin(row_ids).all():
+        return None  # rows were removed
+    added = np.flatnonzero(~pd.Index(row_ids).isin(previous_rows))
+    if len(added) == 0 or len(added) > limits['max_added_fraction'] * len(previous_rows):
+        return None
+    current_labels = y.loc[previous_rows].to_numpy()
+    if np.mean(current_labels != previous['labels']) > limits['max_label_drift']:
+        return None
+    base_trees = previous['params']['model']['n_estimators']
+    if previous['model'].n_estimators >= limits['max_tree_growth'] * base_trees:
+        return None
+    return added
+
+
+def update_eps_model(previous, X, y, added, n_jobs=None):
+    """Grow ``previous``'s forest with trees fitted on the added rows
+
+    The selector is kept as-is; the added rows are split with the same
+    test share, new trees are fitted on their training part (warm start)
+    and accuracy is measured on the previous and new hold-out rows.
+    Returns None when the added training rows do not contain both classes.
+    """
+    params = previous['params']
+    selector = previous['selector']
+    X_added = selector.transform(X.iloc[added])
+    y_added = y.iloc[added]
+    train_pos, test_pos = _split(len(added), params)
+    if y_added.iloc[train_pos].nunique() < 2:
+        return None
+
+    model = copy.deepcopy(previous['model'])
+    base_trees = params['model']['n_estimators']
+    previous_train = len(previous['row_ids']) - len(previous['test_ids'])
+    extra_trees = max(1, round(base_trees * len(train_pos) / max(previous_train, 1)))
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_trees, n_jobs=n_jobs)
+    model.fit(X_added[train_pos], y_added.iloc[train_pos])
+    model.set_params(warm_start=False)
+
+    test_ids = np.concatenate([previous['test_ids'], X.index.to_numpy()[added][test_pos]])
+    X_test = selector.transform(X.loc[test_ids])
+    return dict(
+        previous,
+        model=model,
+        mode='incremental',
+        accuracy=model.score(X_test, y.loc[test_ids]),
+        feature_importance=model.feature_importances_,
+        row_ids=X.index.to_numpy(),
+        labels=y.to_numpy(dtype=np.int8),
+        test_ids=test_ids
+    )
+
+
+def update_or_train(previous, X, y, added, feature_cols=FEATURE_COLS, params=DEFAULT_PARAMS, n_jobs=None):
+    """Fold the added rows into ``previous``, refitting fully if that is not possible"""
+    result = update_eps_model(previous, X, y, added, n_jobs=n_jobs)
+    if result is None:
+        result = train_eps_model(X, y, feature_cols, params, n_jobs=n_jobs)
+    return result
+
+
+def store_result(store, key, result):
+    """Persist a trained model under its key and point ``LATEST_ALIAS`` at it"""
+    result['key'] = key
+    store.put(key, result)
+    mark_latest(store, result)
+
+
+def mark_latest(store, result):
+    """Point ``LATEST_ALIAS`` at a stored model"""
+    store.put(LATEST_ALIAS, {'key': result['key'], 'feature_cols': result['feature_cols'], 'stored_at': time.time()})
+
+
+def load_model(store, name=LATEST_ALIAS):
+    """Return the stored model for a training key or an alias, or None"""
+    bundle = store.get(name)
+    if bundle is not None and 'model' not in bundle:
+        bundle = store.get(bundle['key'])
+    return bundle
+
+
+def load_or_train(filtered_df, store, feature_cols=FEATURE_COLS, params=DEFAULT_PARAMS):
+    """Return the model for these rows from the store, training it on a miss
+
+    Returns None when there are too few rows to train on.
+    """
+    X, y = prepare_training_data(filtered_df, feature_cols)
+    if len(X) <= MIN_ROWS:  # Ensure enough data for modeling
+        return None
+    key = training_key(X, y, feature_cols, params)
+    result = store.get(key)
+    if result is None:
+        result = train_eps_model(X, y, feature_cols, params)
+        store_result(store, key, result)
+    return result
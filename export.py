@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Static report export for filter presets
+
+Renders the KPI cards, every dashboard chart and the summary table of each
+preset into a self-contained HTML file (plotly.js inlined, so it opens
+offline), plus optional PNGs of the charts when kaleido is installed:
+
+    python export.py [presets.json] [--output reports] [--workers N] [--png]
+
+Presets render concurrently in worker processes that share the memory-mapped
+dataset. Aggregates and figures are read through the same shared stores and
+keys as the dashboard and precompute.py, so presets that were already viewed
+or precomputed, or that repeat another preset's filter, are not recomputed.
+Each chart's rendered HTML is stored next to its figure, so a repeated chart
+skips rebuilding the figure object, and plotly.js is loaded once per worker
+rather than once per report.
+"""
+import argparse
+import html
+import importlib.util
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+import analytics
+import atomic_write
+import charts
+from app_config import AGGREGATE_STORE_MB, FIGURE_CACHE_MB, FIGURE_STORE_MB, THEME_CONFIG
+from cache_backend import open_store
+from figure_cache import FigureCache, filter_key, store_key
+from precompute import DEFAULT_PRESETS, load_data, load_presets, resolve_preset
+
+# The dashboard's chart rows: (figure key, title, builder, aggregate or None for the filtered rows).
+# Figure keys match app.py's, so both read and fill the same shared figure store.
+REPORT_ROWS = [
+    [('revenue_by_company', "Revenue by Company", charts.revenue_by_company_chart, 'revenue_by_company'),
+     ('market_cap', "Market Cap Distribution", charts.market_cap_chart, 'market_cap_by_company'),
+     ('roe_roa', "ROE vs ROA", charts.roe_roa_chart, None)],
+    [('revenue_trend', "Revenue Trends Over Time", charts.revenue_trend_chart, 'revenue_trend'),
+     ('industry_performance', "Performance by Industry", charts.industry_performance_chart, 'industry_metrics')],
+    [('ratio_distribution', "Financial Ratios Distribution", charts.ratio_distribution_chart, None),
+     ('employees', "Employee Count", charts.employee_chart, 'employee_counts'),
+     ('margins', "Profit Margins", charts.margin_chart, 'profit_margins')],
+    [('eps_trend', "Earnings Per Share Trends", charts.eps_trend_chart, None),
+     ('cash_flow', "Cash Flow Analysis", charts.cash_flow_chart, 'cash_flow')],
+    [('growth', "Revenue Growth", charts.growth_chart, 'growth_by_company'),
+     ('real_revenue', "Nominal vs Real Revenue", charts.real_revenue_chart, 'real_revenue_trend')]
+]
+
+PAGE_STYLE = f'''
+body {{ background: {THEME_CONFIG['backgroundColor']}; color: {THEME_CONFIG['textColor']};
+       font-family: "Source Sans Pro", sans-serif; margin: 2rem; }}
+.meta {{ color: #cccccc; }}
+.kpis, .chart-row {{ display: flex; gap: 1rem; margin: 1.5rem 0; }}
+.metric-card, .chart-container {{ flex: 1; min-width: 0; background: #2d2d2d; border: 1px solid #404040;
+                                  border-radius: 12px; padding: 1rem; }}
+.metric-card {{ text-align: center; padding: 2rem 1rem; }}
+.metric-value {{ font-size: 2.5rem; font-weight: bold; }}
+.metric-label {{ color: #cccccc; }}
+table.summary {{ border-collapse: collapse; width: 100%; }}
+table.summary th, table.summary td {{ border-bottom: 1px solid #404040; padding: 0.4rem 0.8rem; text-align: right; }}
+a {{ color: {THEME_CONFIG['textColor']}; }}
+'''
+
+_worker = {}
+
+
+def slugify(name):
+    """Return a file-name-safe version of a preset name"""
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'preset'
+
+
+def report_paths(presets, output_dir):
+    """Return a unique HTML path per preset, in order"""
+    paths = []
+    seen = set()
+    for number, preset in enumerate(presets, 1):
+        slug = slugify(preset.get('name', f'preset-{number}'))
+        if slug in seen:
+            slug = f'{slug}-{number}'
+        seen.add(slug)
+        paths.append(os.path.join(output_dir, slug + '.html'))
+    return paths
+
+
+def describe_filter(preset, companies, year_range, industries):
+    """Return a one-line description of a preset's filter"""
+    return (
+        f"Companies: {', '.join(companies) if preset.get('companies') else f'all ({len(companies)})'} · "
+        f"Years: {year_range[0]}-{year_range[1]} · "
+        f"Industries: {', '.join(industries) if preset.get('industries') else f'all ({len(industries)})'}"
+    )
+
+
+def render_report(title, description, kpis, chart_rows, summary, plotlyjs):
+    """Return the HTML page of one report
+
+    ``chart_rows`` holds one list of (title, chart HTML) per row; ``kpis`` the
+    (title, value) of each card; ``summary`` the formatted summary table.
+    """
+    parts = [
+        '<!DOCTYPE html>',
+        '<html><head><meta charset="utf-8">',
+        f'<title>{html.escape(title)}</title>',
+        f'<style>{PAGE_STYLE}</style>',
+        f'<script type="text/javascript">{plotlyjs}</script>',
+        '</head><body>',
+        f'<h1>📊 {html.escape(title)}</h1>',
+        f'<p class="meta">{html.escape(description)}</p>'
+    ]
+    if kpis is None:
+        parts.append('<p>No data available for the selected filters.</p>')
+    else:
+        parts.append('<div class="kpis">')
+        for card_title, value in kpis:
+            parts.append(f'<div class="metric-card"><div class="metric-value">{html.escape(str(value))}</div>'
+                         f'<div class="metric-label">{html.escape(card_title)}</div></div>')
+        parts.append('</div>')
+        for row in chart_rows:
+            parts.append('<div class="chart-row">')
+            for chart_title, chart in row:
+                parts.append(f'<div class="chart-container"><h3>{html.escape(chart_title)}</h3>{chart}</div>')
+            parts.append('</div>')
+        parts.append('<h2>📋 Financial Data Summary</h2>')
+        parts.append(summary.to_html(classes='summary', border=0))
+    parts.append('</body></html>')
+    return '\n'.join(parts)
+
+
+def _init_worker(png):
+    # The dataset is memory-mapped and the stores live on disk, so every worker shares them
+    figure_store = open_store('figures', FIGURE_STORE_MB * 1024 * 1024)
+    _worker.update(
+        data=load_data(),
+        aggregate_store=open_store('aggregates', AGGREGATE_STORE_MB * 1024 * 1024),
+        figure_store=figure_store,
+        figures=FigureCache(FIGURE_CACHE_MB * 1024 * 1024, shared=figure_store),
+        plotlyjs=get_plotlyjs(),
+        png=png
+    )
+
+
+def chart_html(key, build):
+    """Return the HTML fragment of the figure under ``key``, rendering and storing it on a miss"""
+    # Unpickling a stored figure re-validates every property; the rendered fragment is a plain string
+    html_key = store_key(('html',) + key)
+    fragment = _worker['figure_store'].get(html_key)
+    if fragment is None:
+        fig = _worker['figures'].get_or_build(key, build)
+        fragment = pio.to_html(fig, full_html=False, include_plotlyjs=False, config={'responsive': True})
+        _worker['figure_store'].put(html_key, fragment)
+    return fragment
+
+
+def export_preset(preset, path):
+    """Render one preset's report to ``path``; return a status line"""
+    start = time.perf_counter()
+    data = _worker['data']
+    figures = _worker['figures']
+    companies, year_range, industries = resolve_preset(preset, data.frame)
+    data_version = data.version_for(companies, year_range, industries)
+    figure_key = filter_key(companies, year_range, industries, data_version)
+    aggregates = analytics.load_or_compute_aggregates(
+        data.cube, companies, year_range, industries, data_version, _worker['aggregate_store']
+    )
+    title = preset.get('name', os.path.splitext(os.path.basename(path))[0])
+    description = describe_filter(preset, companies, year_range, industries)
+
+    if aggregates['kpis']['companies'] == 0:
+        atomic_write.write_text(path, render_report(title, description, None, [], None, _worker['plotlyjs']))
+        return f"{title}: no data, {path}"
+
+    # Filtered rows are only resolved when a row-level chart is not stored yet
+    rows = []
+
+    def builder(build, source):
+        def build_figure():
+            if source is not None:
+                return build(aggregates[source])
+            if not rows:
+                rows.append(data.index.apply(data.frame, companies, year_range, industries))
+            return build(rows[0])
+        return build_figure
+
+    chart_rows = [
+        [(chart_title, chart_html((name,) + figure_key, builder(build, source)))
+         for name, chart_title, build, source in row]
+        for row in REPORT_ROWS
+    ]
+    atomic_write.write_text(path, render_report(
+        title, description, analytics.format_kpis(aggregates['kpis']), chart_rows,
+        analytics.format_summary(aggregates['summary']), _worker['plotlyjs']
+    ))
+
+    status = path
+    if _worker['png']:
+        image_dir = os.path.splitext(path)[0]
+        os.makedirs(image_dir, exist_ok=True)
+        for row in REPORT_ROWS:
+            for name, _, build, source in row:
+                fig = figures.get_or_build((name,) + figure_key, builder(build, source))
+                fig.write_image(os.path.join(image_dir, f'{name}.png'), width=1000, height=fig.layout.height or 450)
+        status += f' and {image_dir}/*.png'
+    return f"{title}: {status} in {time.perf_counter() - start:.2f}s"
+
+
+def write_index(output_dir, presets, paths):
+    """Write an index.html linking every report"""
+    links = ''.join(
+        f'<li><a href="{html.escape(os.path.basename(path))}">{html.escape(preset.get("name", "?"))}</a></li>'
+        for preset, path in zip(presets, paths)
+    )
+    atomic_write.write_text(os.path.join(output_dir, 'index.html'), (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Reports</title>'
+        f'<style>{PAGE_STYLE}</style></head><body><h1>Reports</h1>'
+        f'<p class="meta">Exported {time.strftime("%Y-%m-%d %H:%M")}</p><ul>{links}</ul></body></html>'
+    ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export static dashboard reports for filter presets')
+    parser.add_argument('presets', nargs='?', default=DEFAULT_PRESETS, help='JSON list of presets')
+    parser.add_argument('--output', default='reports', help='directory to write the reports to')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--png', action='store_true', help='also write each chart as PNG (needs kaleido)')
+    args = parser.parse_args(argv)
+
+    if args.png and importlib.util.find_spec('kaleido') is None:
+        print("PNG export needs the kaleido package: pip install kaleido", file=sys.stderr)
+        return 1
+    presets = load_presets(args.presets)
+    os.makedirs(args.output, exist_ok=True)
+    paths = report_paths(presets, args.output)
+
+    start = time.perf_counter()
+    workers = max(1, min(args.workers, len(presets)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(args.png,)) as pool:
+        for line in pool.map(export_preset, presets, paths):
+            print(line)
+    write_index(args.output, presets, paths)
+    print(f"Exported {len(presets)} reports with {workers} workers in {time.perf_counter() - start:.2f}s "
+          f"-> {os.path.join(args.output, 'index.html')}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
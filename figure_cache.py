@@ -0,0 +1,122 @@
+"""
+Bounded LRU cache of rendered Plotly figures
+
+Figures are keyed by the chart name plus the filter state and data version
+that produced them. Entries are evicted least-recently-used first once the
+estimated size of the cached figures (their data arrays plus a fixed share
+for layout and template) exceeds the memory budget. An optional
+shared store (see cache_backend.py) backs the in-memory cache, so a figure
+built by one process is reused by the others.
+"""
+import hashlib
+import threading
+
+import numpy as np
+
+from byte_lru import ByteLRU
+
+# Trace properties holding one value per point (or cell, or slice); nested ones such as marker sizes
+# are left out, since reading them through plotly's validators costs more than the estimate saves
+TRACE_ARRAYS = ('x', 'y', 'z', 'values', 'text', 'customdata')
+# Rough size of a figure's layout, template and scalar trace properties, and of one non-numeric value
+FIGURE_BYTES = 16 * 1024
+ITEM_BYTES = 64
+
+
+def filter_key(companies, year_range, industries, data_version):
+    """Return a hashable, order-insensitive key for a filter state"""
+    return (
+        tuple(sorted(companies)),
+        (int(year_range[0]), int(year_range[1])),
+        tuple(sorted(industries)),
+        data_version
+    )
+
+
+def store_key(key):
+    """Return the string key of a figure key in a shared store"""
+    return 'fig-' + hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+
+def _array_bytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes if value.dtype != object else value.size * ITEM_BYTES
+    if isinstance(value, (list, tuple)):
+        return len(value) * ITEM_BYTES
+    return 0
+
+
+def figure_size(figure):
+    """Estimate a figure's size in bytes from its data arrays, without serializing it"""
+    size = FIGURE_BYTES
+    for trace in figure.data:
+        size += sum(_array_bytes(getattr(trace, name, None)) for name in TRACE_ARRAYS)
+    return size
+
+
+class FigureCache:
+    """Thread-safe LRU of figures with a byte budget and hit/miss counters"""
+
+    def __init__(self, max_bytes, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.shared_hits = 0
+        self._figures = ByteLRU(max_bytes)
+        # Guards the counters; the LRU has its own lock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached figure for ``key``, or None"""
+        figure = self._figures.get(key)
+        if figure is not None:
+            with self._lock:
+                self.hits += 1
+            return figure
+        figure = self.shared.get(store_key(key)) if self.shared is not None else None
+        with self._lock:
+            if figure is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self.put(key, figure, share=False)
+        return figure
+
+    def put(self, key, figure, size=None, share=True):
+        """Insert a figure, evicting old entries to stay within budget
+
+        ``size`` defaults to ``figure_size``'s estimate.
+        """
+        if share and self.shared is not None:
+            self.shared.put(store_key(key), figure)
+        if size is None:
+            size = figure_size(figure)
+        self._figures.put(key, figure, size)
+
+    def get_or_build(self, key, build):
+        """Return the cached figure for ``key``, building and caching it on a miss"""
+        figure = self.get(key)
+        if figure is None:
+            figure = build()
+            self.put(key, figure)
+        return figure
+
+    def clear(self):
+        """Drop every cached figure (counters are kept)"""
+        self._figures.clear()
+
+    def stats(self):
+        """Return a snapshot of the cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._figures),
+                'bytes': self._figures.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self._figures.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,35 @@
+"""
+Advisory inter-process file lock
+
+Used where several Streamlit processes, replicas on a shared volume or batch
+jobs may write the same on-disk store at once. On platforms without
+``fcntl`` the lock is a no-op.
+"""
+import os
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive ``flock`` on a lock file, held for the duration of a ``with`` block"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+
+    def __enter__(self):
+        self.handle = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+        return False
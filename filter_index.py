@@ -0,0 +1,155 @@
+"""
+Indexed resolution of the sidebar company/year/industry filter
+
+Companies and industries are dictionary-encoded once, and the rows of each
+code are kept as a sorted posting list (a sparse row bitmap). Years are kept
+as a year-sorted position index. A filter state is resolved by starting from
+the most selective dimension's candidate rows and checking only those rows
+against per-code membership bitmaps for the other dimensions, so an
+interaction never has to hash every row the way ``isin`` does.
+
+An index can be saved as ``.npy`` arrays and loaded memory-mapped, so the
+processes serving one published dataset share a single copy of it.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class PostingIndex:
+    """Row positions grouped by the categorical code of one column"""
+
+    def __init__(self, values):
+        codes, labels = pd.factorize(values, sort=True)
+        # Missing values get a trailing code that is never selected
+        codes[codes < 0] = len(labels)
+        self.labels = labels
+        self.codes = codes
+        self.lookup = {label: code for code, label in enumerate(labels)}
+        # CSR layout: rows of code c are order[offsets[c]:offsets[c + 1]]
+        self.order = np.argsort(codes, kind='stable')
+        self.offsets = np.searchsorted(codes[self.order], np.arange(len(labels) + 1))
+
+    def save(self, directory, name):
+        """Write the posting arrays and labels under ``directory``"""
+        for part in ('codes', 'order', 'offsets'):
+            np.save(os.path.join(directory, f'{name}_{part}.npy'), getattr(self, part), allow_pickle=False)
+        with open(os.path.join(directory, f'{name}_labels.json'), 'w') as handle:
+            json.dump([str(label) for label in self.labels], handle)
+
+    @classmethod
+    def load(cls, directory, name):
+        """Open an index written by ``save``, memory-mapping the posting arrays"""
+        index = cls.__new__(cls)
+        for part in ('codes', 'order', 'offsets'):
+            path = os.path.join(directory, f'{name}_{part}.npy')
+            setattr(index, part, np.load(path, mmap_mode='r', allow_pickle=False).view(np.ndarray))
+        with open(os.path.join(directory, f'{name}_labels.json')) as handle:
+            index.labels = pd.Index(json.load(handle), dtype=object)
+        index.lookup = {label: code for code, label in enumerate(index.labels)}
+        return index
+
+    def selected_codes(self, selection):
+        """Return the codes of the selected labels that exist in the data"""
+        return np.array(
+            [self.lookup[label] for label in selection if label in self.lookup],
+            dtype=np.intp
+        )
+
+    def membership(self, codes):
+        """Return a per-code bitmap with the given codes set"""
+        bitmap = np.zeros(len(self.labels) + 1, dtype=bool)
+        bitmap[codes] = True
+        return bitmap
+
+    def count(self, codes):
+        """Return how many rows carry any of the given codes"""
+        return int((self.offsets[codes + 1] - self.offsets[codes]).sum())
+
+    def positions(self, codes):
+        """Return the row positions carrying any of the given codes (OR)"""
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self.order[self.offsets[code]:self.offsets[code + 1]] for code in codes])
+
+
+class FilterIndex:
+    """Resolve sidebar filter states to row positions of a frame"""
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.company = PostingIndex(df['Company'])
+        self.industry = PostingIndex(df['Industry'])
+        years = df['Year'].to_numpy()
+        self.year_order = np.argsort(years, kind='stable')
+        self.sorted_years = years[self.year_order]
+        self.years = years
+
+    def save(self, directory):
+        """Write the index as arrays under ``directory``"""
+        os.makedirs(directory, exist_ok=True)
+        self.company.save(directory, 'company')
+        self.industry.save(directory, 'industry')
+        for part in ('year_order', 'sorted_years', 'years'):
+            np.save(os.path.join(directory, f'{part}.npy'), np.asarray(getattr(self, part)), allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory):
+        """Open an index written by ``save`` without copying its arrays"""
+        index = cls.__new__(cls)
+        index.company = PostingIndex.load(directory, 'company')
+        index.industry = PostingIndex.load(directory, 'industry')
+        for part in ('year_order', 'sorted_years', 'years'):
+            path = os.path.join(directory, f'{part}.npy')
+            setattr(index, part, np.load(path, mmap_mode='r', allow_pickle=False).view(np.ndarray))
+        index.n_rows = len(index.years)
+        return index
+
+    def _year_bounds(self, year_range):
+        start = np.searchsorted(self.sorted_years, year_range[0], side='left')
+        stop = np.searchsorted(self.sorted_years, year_range[1], side='right')
+        return start, stop
+
+    def positions(self, companies, year_range, industries):
+        """Return the sorted row positions matching the filter state"""
+        company_codes = self.company.selected_codes(companies)
+        industry_codes = self.industry.selected_codes(industries)
+        start, stop = self._year_bounds(year_range)
+
+        candidates = {
+            'company': self.company.count(company_codes),
+            'industry': self.industry.count(industry_codes),
+            'year': max(stop - start, 0)
+        }
+        driver = min(candidates, key=candidates.get)
+        if candidates[driver] == 0:
+            return np.empty(0, dtype=np.intp)
+
+        if driver == 'company':
+            rows = self.company.positions(company_codes)
+        elif driver == 'industry':
+            rows = self.industry.positions(industry_codes)
+        else:
+            rows = self.year_order[start:stop]
+
+        keep = np.ones(len(rows), dtype=bool)
+        if driver != 'company':
+            keep &= self.company.membership(company_codes)[self.company.codes[rows]]
+        if driver != 'industry':
+            keep &= self.industry.membership(industry_codes)[self.industry.codes[rows]]
+        if driver != 'year':
+            row_years = self.years[rows]
+            keep &= (row_years >= year_range[0]) & (row_years <= year_range[1])
+        return np.sort(rows[keep])
+
+    def mask(self, companies, year_range, industries):
+        """Return the boolean row mask equivalent to the isin/range filter"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.positions(companies, year_range, industries)] = True
+        return mask
+
+    def apply(self, df, companies, year_range, industries):
+        """Return the rows of ``df`` (the indexed frame) matching the filter state"""
+        return df.take(self.positions(companies, year_range, industries))
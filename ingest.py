@@ -0,0 +1,306 @@
+"""
+Incremental ingestion of new statement files
+
+New CSV files dropped into the incoming directory are parsed in bounded
+chunks and each chunk is appended to the dataset as a partition: a column
+bundle in the snapshot format, listed in a JSON ledger. The base snapshot is
+never rewritten.
+
+``Dataset`` serves the base snapshot plus every partition, with the derived
+metrics added. A refresh picks up new partitions (ingested by this process
+or by ``python ingest.py``), appends their rows, recomputes the derived
+metrics and cube cells of the companies they touch (growth rates of a
+company's other years can change) and rebuilds the filter index.
+``DatasetState.version_for`` only changes for filter states that select a
+cell of such a company, so the cached aggregates, figures and models of
+every other filter state stay valid. With a shared ``store`` the cube and
+filter index of each version are built once and reused by every process.
+
+Incoming files are treated as immutable: a file is ingested once, keyed by
+its name, and its rows are appended as they are (restatements are not
+deduplicated).
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import atomic_write
+import cube
+import data_store
+import derived
+import schema
+from file_lock import FileLock
+from filter_index import FilterIndex
+
+logger = logging.getLogger(__name__)
+
+LEDGER_FORMAT = 1
+LEDGER_NAME = 'ledger.json'
+# Files modified more recently than this may still be being written
+SETTLE_SECONDS = 2.0
+
+
+def read_ledger(partition_dir):
+    """Return the ledger of ingested files and partitions"""
+    try:
+        with open(os.path.join(partition_dir, LEDGER_NAME)) as handle:
+            ledger = json.load(handle)
+    except (OSError, ValueError):
+        ledger = None
+    if ledger is None or ledger.get('format') != LEDGER_FORMAT:
+        ledger = {'format': LEDGER_FORMAT, 'files': {}, 'partitions': []}
+    return ledger
+
+
+def _write_ledger(partition_dir, ledger):
+    atomic_write.write_json(os.path.join(partition_dir, LEDGER_NAME), ledger)
+
+
+def pending_files(incoming_dir, ledger, settle_seconds=SETTLE_SECONDS):
+    """Return the names of settled CSV files in ``incoming_dir`` not yet ingested"""
+    if not incoming_dir or not os.path.isdir(incoming_dir):
+        return []
+    now = time.time()
+    names = []
+    for entry in os.scandir(incoming_dir):
+        if not entry.is_file() or not entry.name.lower().endswith('.csv'):
+            continue
+        if entry.name in ledger['files'] or now - entry.stat().st_mtime < settle_seconds:
+            continue
+        names.append(entry.name)
+    return sorted(names)
+
+
+def _conform(chunk, dtypes):
+    """Align a normalized chunk with the dataset's columns and dtypes"""
+    missing = [name for name in dtypes if name not in chunk.columns]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    chunk = chunk[list(dtypes)].copy()
+    for name, dtype in dtypes.items():
+        # Categories are re-encoded per partition, so new tickers are kept
+        if chunk[name].dtype != dtype and not isinstance(dtype, pd.CategoricalDtype):
+            try:
+                chunk[name] = chunk[name].astype(dtype)
+            except (TypeError, ValueError):
+                # e.g. an integer column with gaps stays float
+                pass
+    return chunk
+
+
+def ingest_file(path, digest, partition_dir, dtypes, chunk_rows):
+    """Parse one CSV in chunks into partition bundles and return their entries"""
+    partitions = []
+    for number, chunk in enumerate(pd.read_csv(path, chunksize=chunk_rows)):
+        chunk = _conform(data_store.normalize_columns(chunk), dtypes)
+        partition_id = f'{digest[:16]}-{number:05d}'
+        columns = data_store.write_bundle(chunk, os.path.join(partition_dir, partition_id))
+        partitions.append({'id': partition_id, 'rows': len(chunk), 'columns': columns})
+    return partitions
+
+
+def ingest_pending(incoming_dir, partition_dir, dtypes, chunk_rows):
+    """Ingest every new file in ``incoming_dir``; return the ids of new partitions"""
+    new_ids = []
+    # Concurrent ingesters must not ingest the same file twice
+    with FileLock(os.path.join(partition_dir, '.lock')):
+        # Re-read under the lock: another process may have ingested meanwhile
+        ledger = read_ledger(partition_dir)
+        for name in pending_files(incoming_dir, ledger):
+            path = os.path.join(incoming_dir, name)
+            record = data_store.file_fingerprint(path)
+            try:
+                record['sha256'] = data_store.file_digest(path)
+                duplicate = next(
+                    (other for other, seen in ledger['files'].items() if seen.get('sha256') == record['sha256']), None
+                )
+                if duplicate is not None:
+                    raise ValueError(f"same content as {duplicate}")
+                partitions = ingest_file(path, record['sha256'], partition_dir, dtypes, chunk_rows)
+            except (OSError, ValueError, pd.errors.ParserError) as e:
+                # Recorded, so a bad file is reported once instead of on every poll
+                logger.warning("Skipping %s: %s", name, e)
+                record['error'] = str(e)
+                partitions = []
+            record['partitions'] = [partition['id'] for partition in partitions]
+            ledger['files'][name] = record
+            ledger['partitions'].extend(dict(partition, file=name) for partition in partitions)
+            new_ids.extend(record['partitions'])
+            _write_ledger(partition_dir, ledger)
+    return new_ids
+
+
+def read_partition(partition_dir, partition):
+    """Open one partition bundle as a frame"""
+    return data_store.read_bundle(os.path.join(partition_dir, partition['id']), partition['columns'])
+
+
+def touched_cells(frame, partition, partition_id):
+    """Return every (Company, Year, Industry) cell of the companies a partition adds rows to"""
+    cells = frame.loc[frame['Company'].isin(partition['Company'].unique()), cube.DIMENSIONS].drop_duplicates()
+    cells['Partition'] = partition_id
+    return cells
+
+
+class DatasetState:
+    """One consistent version of the rows, cube and filter index"""
+
+    def __init__(self, frame, full_cube, index, base_version, touched):
+        self.frame = frame
+        self.cube = full_cube
+        self.index = index
+        self.base_version = base_version
+        self.touched = touched
+        self.partitions = list(touched['Partition'].unique())
+        self.version = _combine(base_version, self.partitions)
+
+    def version_for(self, companies, year_range, industries):
+        """Return a data version that only changes when the selected cells change"""
+        if not self.partitions:
+            return self.base_version
+        touched = self.touched
+        mask = (
+            touched['Company'].isin(companies) &
+            (touched['Year'] >= year_range[0]) &
+            (touched['Year'] <= year_range[1]) &
+            touched['Industry'].isin(industries)
+        )
+        if not mask.any():
+            return self.base_version
+        selected = set(touched.loc[mask, 'Partition'])
+        # Partitions keep their ledger order, so the version is deterministic
+        return _combine(self.base_version, [p for p in self.partitions if p in selected])
+
+
+def _combine(base_version, partition_ids):
+    if not partition_ids:
+        return base_version
+    digest = hashlib.sha256(base_version.encode())
+    for partition_id in partition_ids:
+        digest.update(partition_id.encode())
+    return digest.hexdigest()[:16]
+
+
+class Dataset:
+    """The base snapshot plus every ingested partition, refreshed in place"""
+
+    def __init__(self, csv_path, snapshot_dir, partition_dir, incoming_dir=None,
+                 chunk_rows=100_000, poll_seconds=10.0, store=None, float32=False):
+        self.partition_dir = partition_dir
+        self.incoming_dir = incoming_dir
+        self.chunk_rows = chunk_rows
+        self.poll_seconds = poll_seconds
+        self.store = store
+        self._lock = threading.Lock()
+        self._last_poll = 0.0
+
+        # Bundle and version come from one manifest: a process with the other ratio dtype may repoint it any time
+        manifest = data_store.ensure_snapshot(csv_path, snapshot_dir, float32)
+        base = data_store.read_bundle(os.path.join(snapshot_dir, manifest['bundle']), manifest['columns'])
+        self.dtypes = base.dtypes.to_dict()
+        # Real values stay in the base snapshot's latest-year dollars as data is appended
+        self.base_year = int(base['Year'].max())
+        partitions = read_ledger(partition_dir)['partitions']
+        frames = [read_partition(partition_dir, partition) for partition in partitions]
+        frame = schema.concat([base] + frames) if frames else base
+        # Appended files only add inflation rates for years the data did not have yet
+        self.inflation = derived.inflation_rates(base)
+        for part in frames:
+            self.inflation = derived.inflation_rates(part, self.inflation)
+        derived.add_derived_metrics(frame, prices=derived.price_index(self.inflation, self.base_year))
+        touched = [touched_cells(frame, part, partition['id']) for part, partition in zip(frames, partitions)]
+        self._loaded = {partition['id'] for partition in partitions}
+        base_version = data_store.manifest_version(manifest)
+        full_cube, index = self._prepared(frame, _combine(base_version, [p['id'] for p in partitions]))
+        self._state = DatasetState(frame, full_cube, index, base_version, _touched_frame(touched))
+
+    def _prepared(self, frame, version):
+        """Return the cube and filter index of ``frame``, shared through the store when set"""
+        # The snapshot format fixes the dtypes of the cached cube
+        key = f'cube-{data_store.SNAPSHOT_FORMAT}-{version}'
+        bundle = self.store.get(key) if self.store is not None else None
+        if bundle is None:
+            bundle = {'cube': cube.build_cube(frame), 'index': FilterIndex(frame)}
+            if self.store is not None:
+                self.store.put(key, bundle)
+        return bundle['cube'], bundle['index']
+
+    def current(self):
+        """Return the current state; it is never mutated, only replaced"""
+        return self._state
+
+    def refresh(self, force=False):
+        """Ingest new files and append new partitions; return how many were added"""
+        now = time.monotonic()
+        if not force and now - self._last_poll < self.poll_seconds:
+            return 0
+        # Only one session refreshes at a time; the others keep serving the current state
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_poll = now
+            if self.incoming_dir:
+                ingest_pending(self.incoming_dir, self.partition_dir, self.dtypes, self.chunk_rows)
+            new = [p for p in read_ledger(self.partition_dir)['partitions'] if p['id'] not in self._loaded]
+            if not new:
+                return 0
+            self._state = self._append(new)
+            self._loaded.update(partition['id'] for partition in new)
+            logger.info("Appended %d partitions (%d rows)", len(new), sum(p['rows'] for p in new))
+            return len(new)
+        finally:
+            self._lock.release()
+
+    def _append(self, partitions):
+        state = self._state
+        frames = [read_partition(self.partition_dir, partition) for partition in partitions]
+        delta = schema.concat(frames)
+        frame = schema.concat([state.frame, delta])
+        # Only the companies with new rows get their derived metrics and cube cells rebuilt
+        companies = delta['Company'].unique()
+        affected = frame['Company'].isin(companies).to_numpy()
+        for part in frames:
+            self.inflation = derived.inflation_rates(part, self.inflation)
+        prices = derived.price_index(self.inflation, self.base_year)
+        frame.loc[affected, derived.DERIVED_COLS] = derived.derived_metrics(frame[affected], prices)
+        touched = _touched_frame(
+            [state.touched] + [touched_cells(frame, f, p['id']) for f, p in zip(frames, partitions)]
+        )
+        full_cube = cube.replace_companies(state.cube, companies, cube.build_cube(frame[affected]))
+        return DatasetState(frame, full_cube, FilterIndex(frame), state.base_version, touched)
+
+
+def _touched_frame(frames):
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame({'Company': [], 'Year': np.array([], dtype=np.int64), 'Industry': [], 'Partition': []})
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == '__main__':
+    from app_config import DATA_FILE, FLOAT32_RATIOS, INCOMING_DIR, INGEST_CHUNK_ROWS, PARTITION_DIR, SNAPSHOT_DIR
+
+    parser = argparse.ArgumentParser(description='Ingest new statement files into the dataset')
+    parser.add_argument('--incoming', default=INCOMING_DIR, help='directory to read new CSV files from')
+    parser.add_argument('--watch', type=float, metavar='SECONDS', help='keep polling at this interval')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    manifest = data_store.ensure_snapshot(DATA_FILE, SNAPSHOT_DIR, FLOAT32_RATIOS)
+    dtypes = data_store.read_bundle(
+        os.path.join(SNAPSHOT_DIR, manifest['bundle']), manifest['columns']
+    ).dtypes.to_dict()
+    while True:
+        new_ids = ingest_pending(args.incoming, PARTITION_DIR, dtypes, INGEST_CHUNK_ROWS)
+        if new_ids or not args.watch:
+            print(f"Ingested {len(new_ids)} partitions from {args.incoming}")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,47 @@
+"""
+Deferred imports for the heavy ML stack
+
+Most page views never open the machine learning sections, so scikit-learn,
+joblib and the modules built on them are bound at import time but only
+imported on first attribute access.
+
+This is a plain proxy rather than ``importlib.util.LazyLoader``: a lazily
+loaded module sits in ``sys.modules``, and Streamlit (through
+``inspect.getmodule`` and its source file watcher) reads ``__file__`` of
+every module there, which would trigger the import straight away.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        """Whether the underlying module has been imported yet"""
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_module(name):
+    """Return a proxy that imports module ``name`` on first use"""
+    return LazyModule(name)
@@ -0,0 +1,113 @@
+"""
+On-disk store of trained models with size-bounded LRU eviction
+
+The same store also holds other computed bundles, such as the precomputed
+dashboard aggregates, in a separate directory. Each entry is one joblib
+file named after its key. Reads bump the file's mtime so eviction drops the
+least recently used entries first once the store grows past its byte
+budget, and entries idle for longer than ``ttl`` seconds are dropped. An
+entry larger than the whole budget is not stored. The directory can be
+shared by several processes: writes are atomic renames and eviction runs
+under a file lock.
+"""
+import os
+import time
+
+import atomic_write
+from file_lock import FileLock
+from lazy_imports import lazy_module
+
+# Deferred: unpickling a stored model pulls in scikit-learn anyway
+joblib = lazy_module('joblib')
+
+SUFFIX = '.joblib'
+
+
+class ModelStore:
+    """Persist arbitrary picklable model bundles under string keys"""
+
+    def __init__(self, directory, max_bytes, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def _expired(self, path):
+        return bool(self.ttl) and os.stat(path).st_mtime < time.time() - self.ttl
+
+    def get(self, key):
+        """Return the stored bundle for ``key``, or None"""
+        path = self._path(key)
+        try:
+            if self._expired(path):
+                self.delete(key)
+                return None
+            bundle = joblib.load(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A truncated or incompatible file is treated as a miss
+            self.delete(key)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return bundle
+
+    def contains(self, key):
+        """Return whether an unexpired entry exists for ``key``, as ``get`` would find it"""
+        try:
+            return not self._expired(self._path(key))
+        except FileNotFoundError:
+            return False
+
+    def put(self, key, bundle):
+        """Store a bundle atomically and evict old entries past the budget"""
+        with atomic_write.replacing(self._path(key)) as tmp_path:
+            joblib.dump(bundle, tmp_path)
+            if os.path.getsize(tmp_path) > self.max_bytes:
+                # It could never fit; evicting for it would empty the store, itself included
+                os.remove(tmp_path)
+                return
+        self.evict()
+
+    def delete(self, key):
+        """Remove the entry for ``key`` if present"""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """Return (mtime, size, path) for every entry, oldest first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the store fits its budget"""
+        # Serialized, so concurrent writers do not both evict for the same overflow
+        with FileLock(os.path.join(self.directory, '.lock')):
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            expires = time.time() - self.ttl if self.ttl else None
+            for mtime, size, path in entries:
+                if total <= self.max_bytes and (expires is None or mtime >= expires):
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Batch precompute of dashboard results for filter presets
+
+Computes the aggregates behind the KPI cards, charts and summary table for
+every preset (and optionally trains the EPS model) in parallel worker
+processes, and persists them in the same stores the dashboard reads, so
+the first visitor of the day gets warm caches.
+
+    python precompute.py [presets.json] [--workers N] [--models]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import analytics
+import shared_dataset
+from app_config import AGGREGATE_STORE_MB, EPS_PARAMS_FILE, MODEL_STORE_MB
+from cache_backend import open_store
+
+DEFAULT_PRESETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'presets.json')
+
+# Per-worker state, set up once by _init_worker
+_worker = {}
+
+
+def load_presets(path):
+    """Read the list of filter presets from a JSON file"""
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def resolve_preset(preset, df):
+    """Expand nulls in a preset into concrete companies, years and industries"""
+    companies = preset.get('companies') or sorted(df['Company'].dropna().unique())
+    industries = preset.get('industries') or sorted(df['Industry'].dropna().unique())
+    year_range = list(preset.get('year_range') or [None, None])
+    if year_range[0] is None:
+        year_range[0] = int(df['Year'].min())
+    if year_range[1] is None:
+        year_range[1] = int(df['Year'].max())
+    return list(companies), (int(year_range[0]), int(year_range[1])), list(industries)
+
+
+def load_data():
+    """Return the current state of the dataset the dashboard reads"""
+    return shared_dataset.open_dataset().current()
+
+
+def _init_worker(train_models):
+    # The snapshot (or the published dataset) is memory-mapped, so every worker
+    # shares the page cache; ingested partitions are included so keys match the dashboard's
+    _worker.update(
+        data=load_data(),
+        aggregate_store=open_store('aggregates', AGGREGATE_STORE_MB * 1024 * 1024),
+        model_store=open_store('models', MODEL_STORE_MB * 1024 * 1024),
+        train_models=train_models
+    )
+
+
+def precompute_preset(preset):
+    """Compute and persist the results for one preset; return a status line"""
+    start = time.perf_counter()
+    data = _worker['data']
+    companies, year_range, industries = resolve_preset(preset, data.frame)
+    analytics.load_or_compute_aggregates(
+        data.cube, companies, year_range, industries,
+        data.version_for(companies, year_range, industries), _worker['aggregate_store']
+    )
+    status = 'aggregates'
+    if _worker['train_models']:
+        import eps_model
+
+        rows = data.index.apply(data.frame, companies, year_range, industries)
+        # Same parameters as the dashboard, so it finds the precomputed model
+        params, _ = eps_model.load_tuned_params(EPS_PARAMS_FILE)
+        result = eps_model.load_or_train(rows, _worker['model_store'], params=params)
+        status += ', model' if result is not None else ', model skipped (too few rows)'
+    return f"{preset.get('name', '?')}: {status} in {time.perf_counter() - start:.2f}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute dashboard results for filter presets')
+    parser.add_argument('presets', nargs='?', default=DEFAULT_PRESETS, help='JSON list of presets')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--models', action='store_true', help='also train the EPS model per preset')
+    args = parser.parse_args(argv)
+
+    presets = load_presets(args.presets)
+
+    start = time.perf_counter()
+    workers = max(1, min(args.workers, len(presets)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(args.models,)) as pool:
+        for line in pool.map(precompute_preset, presets):
+            print(line)
+    print(f"Precomputed {len(presets)} presets with {workers} workers in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
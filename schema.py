@@ -0,0 +1,60 @@
+"""
+Compact column dtypes of the loaded dataset
+
+The snapshot stores tickers and industries as categoricals (small integer
+codes plus one list of labels), ``Year`` as int16 and, when
+``FLOAT32_RATIOS`` is set, the ratio columns as float32. Categorical codes
+are memory-mapped like any numeric column and make every ``isin``,
+``groupby`` and factorize work on integers instead of hashing strings.
+
+Every groupby on a categorical column must pass ``observed=True``;
+otherwise pandas emits a row for every category, selected or not.
+"""
+import pandas as pd
+
+CATEGORY_COLS = ['Company', 'Industry']
+INTEGER_COLS = {'Year': 'int16'}
+# Unitless ratios, where float32's ~7 significant digits are plenty; amounts stay float64
+RATIO_COLS = ['Current_Ratio', 'Debt_Equity_Ratio', 'ROE', 'ROA', 'ROI', 'Net_Profit_Margin',
+              'Free_Cash_Flow_per_Share', 'Return_on_Tangible_Equity']
+
+
+def compact(df, float32=False):
+    """Convert ``df`` to the compact dtypes in place and return it"""
+    for column in CATEGORY_COLS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column, dtype in INTEGER_COLS.items():
+        # Columns with gaps stay float
+        if column in df.columns and not df[column].isna().any():
+            df[column] = df[column].astype(dtype)
+    if float32:
+        for column in RATIO_COLS:
+            if column in df.columns:
+                df[column] = df[column].astype('float32')
+    return df
+
+
+def concat(frames):
+    """Concatenate frames, keeping the category columns categorical
+
+    ``pd.concat`` falls back to object when the frames' categories differ,
+    e.g. when an ingested file adds a company.
+    """
+    frame = pd.concat(frames, ignore_index=True)
+    for column in CATEGORY_COLS:
+        if column in frame.columns and not isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].astype('category')
+    return frame
+
+
+def memory_report(df):
+    """Return the dtype and in-memory size of each column, largest first, with a total row"""
+    sizes = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': sizes
+    }).sort_values('bytes', ascending=False)
+    report.loc['Total'] = ['', int(sizes.sum())]
+    report['MB'] = (report['bytes'] / 2**20).round(3)
+    return report
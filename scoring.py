@@ -0,0 +1,162 @@
+"""
+Batch scoring with a stored EPS model
+
+Loads a selector and model pair from the model store, by training key or by
+the ``eps-latest`` alias of the most recently trained model, and scores the
+whole dataset (base snapshot plus ingested filings) or given statement CSVs.
+Rows are scored in fixed-size chunks, so memory stays bounded however large
+the input is; each chunk is one vectorized ``predict_proba`` call whose
+trees are spread over ``--workers`` threads (the forest releases the GIL,
+so chunks never have to be pickled to other processes). Probabilities and
+labels are appended to a Parquet file chunk by chunk, and the run reports
+its throughput in rows per second.
+
+    python scoring.py --train                  # fit on every row first, then score
+    python scoring.py --model eps-latest --output scores.parquet
+    python scoring.py --input new_filings.csv --output new_scores.parquet
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import atomic_write
+import data_store
+import eps_model
+from lazy_imports import lazy_module
+
+# Only needed to write the output
+pa = lazy_module('pyarrow')
+pq = lazy_module('pyarrow.parquet')
+
+ID_COLS = ['Company', 'Year', 'Industry']
+
+
+def output_schema():
+    """Return the Arrow schema of the scores file"""
+    return pa.schema([
+        ('Company', pa.string()),
+        ('Year', pa.int32()),
+        ('Industry', pa.string()),
+        ('EPS_Probability', pa.float32()),
+        ('EPS_Label', pa.int8())
+    ])
+
+
+def dataset_chunks(frame, chunk_rows):
+    """Yield consecutive row slices of an in-memory (or memory-mapped) frame"""
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def csv_chunks(paths, chunk_rows):
+    """Yield normalized chunks of statement CSV files"""
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            yield data_store.normalize_columns(chunk)
+
+
+def score_chunk(bundle, chunk):
+    """Return the above-median EPS probability and label of every row in ``chunk``"""
+    # Same preparation as training; the selector was fitted on a frame with these column names
+    X = chunk[bundle['feature_cols']].fillna(0)
+    model = bundle['model']
+    proba = model.predict_proba(bundle['selector'].transform(X))
+    positive = int(np.flatnonzero(model.classes_ == 1)[0])
+    return proba[:, positive].astype(np.float32), model.classes_[proba.argmax(axis=1)].astype(np.int8)
+
+
+def score(bundle, chunks, output_path, workers=None):
+    """Score every chunk into ``output_path``; return the row count and stage timings"""
+    # Threads over trees; restored afterwards because the bundle may be cached
+    n_jobs = bundle['model'].n_jobs
+    bundle['model'].set_params(n_jobs=workers or -1)
+    timings = {'read': 0.0, 'score': 0.0, 'write': 0.0}
+    rows = 0
+    try:
+        with atomic_write.replacing(output_path) as tmp_path, pq.ParquetWriter(tmp_path, output_schema()) as writer:
+            start = time.perf_counter()
+            for chunk in chunks:
+                now = time.perf_counter()
+                timings['read'] += now - start
+                missing = [column for column in bundle['feature_cols'] + ID_COLS if column not in chunk.columns]
+                if missing:
+                    raise ValueError(f"input lacks the model's columns: {', '.join(missing)}")
+                probability, label = score_chunk(bundle, chunk)
+                start = time.perf_counter()
+                timings['score'] += start - now
+                writer.write_table(pa.Table.from_arrays([
+                    pa.array(np.asarray(chunk['Company'], dtype=object), pa.string()),
+                    pa.array(chunk['Year'].to_numpy(dtype=np.int32)),
+                    pa.array(np.asarray(chunk['Industry'], dtype=object), pa.string()),
+                    pa.array(probability),
+                    pa.array(label)
+                ], schema=output_schema()))
+                rows += len(chunk)
+                now = time.perf_counter()
+                timings['write'] += now - start
+                start = now
+    finally:
+        bundle['model'].set_params(n_jobs=n_jobs)
+    return rows, timings
+
+
+def main(argv=None):
+    from app_config import EPS_PARAMS_FILE, MODEL_STORE_MB
+    from cache_backend import open_store
+    from shared_dataset import open_dataset
+
+    parser = argparse.ArgumentParser(description='Score rows with a stored EPS model')
+    parser.add_argument('--model', default=eps_model.LATEST_ALIAS, help='training key or alias of the model')
+    parser.add_argument('--train', action='store_true',
+                        help='first fit (or reuse) the model for every row of the dataset and make it the latest')
+    parser.add_argument('--features', choices=sorted(eps_model.FEATURE_SETS), default='base',
+                        help='feature set of the model fitted by --train')
+    parser.add_argument('--input', nargs='+', metavar='CSV', help='statement CSVs to score (default: the dataset)')
+    parser.add_argument('--output', default='eps_scores.parquet')
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='threads per chunk')
+    args = parser.parse_args(argv)
+
+    store = open_store('models', MODEL_STORE_MB * 1024 * 1024)
+    data = None
+    if args.train or not args.input:
+        data = open_dataset().current()
+    if args.train:
+        params, _ = eps_model.load_tuned_params(EPS_PARAMS_FILE, args.features)
+        result = eps_model.load_or_train(data.frame, store, eps_model.FEATURE_SETS[args.features], params)
+        if result is None:
+            print("Too few rows to train on", file=sys.stderr)
+            return 1
+        # load_or_train only moves the alias when it trains; a reused model is made the latest here
+        eps_model.mark_latest(store, result)
+        args.model = result['key']
+
+    bundle = eps_model.load_model(store, args.model)
+    if bundle is None:
+        print(f"No model stored under '{args.model}'; train one in the dashboard or pass --train",
+              file=sys.stderr)
+        return 1
+
+    if args.input:
+        chunks = csv_chunks(args.input, args.chunk_rows)
+    else:
+        chunks = dataset_chunks(data.frame, args.chunk_rows)
+    start = time.perf_counter()
+    try:
+        rows, timings = score(bundle, chunks, args.output, workers=args.workers)
+    except ValueError as e:
+        print(f"Cannot score: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows with model {bundle['key']} in {elapsed:.2f}s "
+          f"({rows / elapsed if elapsed else 0:,.0f} rows/s; read {timings['read']:.2f}s, "
+          f"score {timings['score']:.2f}s, write {timings['write']:.2f}s) -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
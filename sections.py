@@ -0,0 +1,63 @@
+"""
+Dependency-tracked dashboard sections
+
+Streamlit re-executes the whole script on every interaction. Each dashboard
+section declares the inputs it depends on; its computed payload is kept in
+the session and reused for as long as those inputs are unchanged, so a rerun
+only recomputes the sections whose inputs actually changed. Sections with
+their own widgets can additionally run as Streamlit fragments, where the
+installed Streamlit version supports them, so those widgets rerun only
+their own section.
+"""
+import streamlit as st
+
+_STATE_KEY = '_section_results'
+
+# st.fragment (1.37+) / st.experimental_fragment (1.33+); plain call otherwise
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+
+def fragment(func):
+    """Run ``func`` as a Streamlit fragment when supported"""
+    if _fragment is None:
+        return func
+    return _fragment(func)
+
+
+class Lazy:
+    """Compute a value on first use and reuse it for the rest of the rerun"""
+
+    _unset = object()
+
+    def __init__(self, compute):
+        self._compute = compute
+        self._value = self._unset
+
+    def __call__(self):
+        if self._value is self._unset:
+            self._value = self._compute()
+        return self._value
+
+
+def section(name, inputs, compute):
+    """Return ``compute()``, recomputing only when ``inputs`` changed
+
+    ``inputs`` must be comparable with ``==``; it is typically a tuple of the
+    filter state and any section-local widget values.
+    """
+    results = st.session_state.setdefault(_STATE_KEY, {})
+    cached = results.get(name)
+    if cached is not None and cached[0] == inputs:
+        return cached[1]
+    payload = compute()
+    results[name] = (inputs, payload)
+    return payload
+
+
+def invalidate(name=None):
+    """Forget the cached payload of one section, or of every section"""
+    results = st.session_state.setdefault(_STATE_KEY, {})
+    if name is None:
+        results.clear()
+    else:
+        results.pop(name, None)
@@ -0,0 +1,191 @@
+"""
+Published dataset shared by every serving worker
+
+In shared serving mode (``SHARED_DATASET=1``) one loader process builds the
+dataset (base snapshot, ingested partitions and derived metrics), and
+publishes the rows, the cube and the filter index of each version as
+``.npy`` bundles under ``SHARED_DATASET_DIR``:
+
+    python shared_dataset.py             # publish once
+    python shared_dataset.py --watch 10  # keep ingesting and republishing
+
+Dashboard and batch workers attach to the published version read-only. The
+columns (tickers and industries as categorical codes) and index arrays are
+memory-mapped, so they live once in the page cache however many workers
+run. A worker re-attaches when the loader publishes a new version, and older
+versions stay readable for workers that still have them mapped.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import atomic_write
+import data_store
+from filter_index import FilterIndex
+from ingest import DatasetState
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_FORMAT = 1
+MANIFEST_NAME = 'published.json'
+
+
+def read_manifest(publish_dir):
+    """Return the manifest of the published version, or None"""
+    try:
+        with open(os.path.join(publish_dir, MANIFEST_NAME)) as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != PUBLISH_FORMAT:
+        return None
+    return manifest
+
+
+def publish(state, publish_dir):
+    """Write ``state`` under ``publish_dir`` and make it the published version"""
+    version_dir = os.path.join(publish_dir, state.version)
+    # Unique per publisher, so a crashed publish never leaves a half-written version behind
+    tmp_dir = f'{version_dir}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    manifest = {
+        'format': PUBLISH_FORMAT,
+        'version': state.version,
+        'base_version': state.base_version,
+        'rows': len(state.frame),
+        'frame': data_store.write_bundle(state.frame, os.path.join(tmp_dir, 'frame')),
+        'cube': data_store.write_bundle(state.cube, os.path.join(tmp_dir, 'cube')),
+        'touched': data_store.write_bundle(state.touched, os.path.join(tmp_dir, 'touched')),
+        'published': time.time()
+    }
+    state.index.save(os.path.join(tmp_dir, 'index'))
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(tmp_dir, version_dir)
+
+    atomic_write.write_json(os.path.join(publish_dir, MANIFEST_NAME), manifest)
+    # Unlinking only drops the directory entries; attached workers keep their mappings
+    for entry in os.listdir(publish_dir):
+        path = os.path.join(publish_dir, entry)
+        if entry != state.version and os.path.isdir(path) and not entry.endswith('.tmp'):
+            shutil.rmtree(path, ignore_errors=True)
+    return manifest
+
+
+def attach(publish_dir, manifest=None):
+    """Open the published version read-only as a DatasetState"""
+    manifest = manifest or read_manifest(publish_dir)
+    if manifest is None:
+        raise FileNotFoundError(
+            f"No dataset published in {publish_dir}; run `python shared_dataset.py` first"
+        )
+    version_dir = os.path.join(publish_dir, manifest['version'])
+    return DatasetState(
+        data_store.read_bundle(os.path.join(version_dir, 'frame'), manifest['frame']),
+        data_store.read_bundle(os.path.join(version_dir, 'cube'), manifest['cube']),
+        FilterIndex.load(os.path.join(version_dir, 'index')),
+        manifest['base_version'],
+        data_store.read_bundle(os.path.join(version_dir, 'touched'), manifest['touched'])
+    )
+
+
+class SharedDataset:
+    """The published dataset, re-attached when a new version appears
+
+    Offers the ``current``/``refresh`` interface of ``ingest.Dataset``, but
+    never ingests or builds anything itself.
+    """
+
+    def __init__(self, publish_dir, poll_seconds=10.0):
+        self.publish_dir = publish_dir
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._last_poll = time.monotonic()
+        self._state = attach(publish_dir)
+
+    def current(self):
+        """Return the attached state; it is never mutated, only replaced"""
+        return self._state
+
+    def refresh(self, force=False):
+        """Attach to a newly published version; return whether one was found"""
+        now = time.monotonic()
+        if not force and now - self._last_poll < self.poll_seconds:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_poll = now
+            manifest = read_manifest(self.publish_dir)
+            if manifest is None or manifest['version'] == self._state.version:
+                return False
+            try:
+                self._state = attach(self.publish_dir, manifest)
+            except (OSError, ValueError) as e:
+                # Replaced again while attaching; the next poll picks up the newer version
+                logger.warning("Could not attach version %s: %s", manifest['version'], e)
+                return False
+            logger.info("Attached published version %s (%d rows)", manifest['version'], manifest['rows'])
+            return True
+        finally:
+            self._lock.release()
+
+
+def open_dataset():
+    """Open the dataset every app, API and batch process reads
+
+    Attaches to the published dataset when ``SHARED_DATASET`` is set, and
+    otherwise builds the snapshot plus ingested partitions in process, so all
+    of them see the same rows under the same data version. Call ``current()``
+    for the state and ``refresh()`` to pick up new versions.
+    """
+    from app_config import (
+        DATA_FILE, DATA_STORE_MB, FLOAT32_RATIOS, INCOMING_DIR, INGEST_CHUNK_ROWS, INGEST_POLL_SECONDS,
+        PARTITION_DIR, SHARED_DATASET, SHARED_DATASET_DIR, SNAPSHOT_DIR
+    )
+    from cache_backend import open_store
+    from ingest import Dataset
+
+    if SHARED_DATASET:
+        return SharedDataset(SHARED_DATASET_DIR, poll_seconds=INGEST_POLL_SECONDS)
+    return Dataset(
+        DATA_FILE, SNAPSHOT_DIR, PARTITION_DIR, INCOMING_DIR,
+        chunk_rows=INGEST_CHUNK_ROWS, poll_seconds=INGEST_POLL_SECONDS,
+        store=open_store('data', DATA_STORE_MB * 1024 * 1024), float32=FLOAT32_RATIOS
+    )
+
+
+if __name__ == '__main__':
+    from app_config import (
+        DATA_FILE, DATA_STORE_MB, FLOAT32_RATIOS, INCOMING_DIR, INGEST_CHUNK_ROWS, PARTITION_DIR,
+        SHARED_DATASET_DIR, SNAPSHOT_DIR
+    )
+    from cache_backend import open_store
+    from ingest import Dataset
+
+    parser = argparse.ArgumentParser(description='Publish the prepared dataset for shared serving')
+    parser.add_argument('--incoming', default=INCOMING_DIR, help='directory to read new CSV files from')
+    parser.add_argument('--watch', type=float, metavar='SECONDS', help='keep ingesting and republishing at this interval')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    dataset = Dataset(
+        DATA_FILE, SNAPSHOT_DIR, PARTITION_DIR, args.incoming, chunk_rows=INGEST_CHUNK_ROWS,
+        store=open_store('data', DATA_STORE_MB * 1024 * 1024), float32=FLOAT32_RATIOS
+    )
+    published = None
+    while True:
+        state = dataset.current()
+        if state.version != published:
+            start = time.perf_counter()
+            manifest = publish(state, SHARED_DATASET_DIR)
+            published = state.version
+            print(f"Published {published}: {manifest['rows']} rows to {SHARED_DATASET_DIR} "
+                  f"in {time.perf_counter() - start:.2f}s")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+        dataset.refresh(force=True)
@@ -0,0 +1,181 @@
+"""
+Per-section timing and memory spans
+
+A rerun of the dashboard is wrapped in a ``Trace``; each section of
+``main()`` opens a named span recording wall time, CPU time of the script
+thread and the net change in traced Python allocations. Finished traces are
+logged as one JSON line and folded into process-wide totals that are written
+as a Prometheus text file.
+
+When profiling is off no trace is active and ``span()`` returns a shared
+no-op context manager, so the instrumentation costs one thread-local lookup.
+Allocation deltas come from tracemalloc, which is process-wide: with several
+concurrent sessions they include the other sessions' allocations.
+
+``process_memory`` reports the resident memory of the current worker split
+into shared and private pages, which shows how much of it is the published
+dataset mapped by every worker (see shared_dataset.py).
+"""
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+import atomic_write
+
+logger = logging.getLogger('dashboard.telemetry')
+
+_NULL_SPAN = nullcontext()
+_local = threading.local()
+
+
+class Trace:
+    """The spans recorded during one rerun"""
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self._depth = 0
+        self.started = time.time()
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def to_dict(self):
+        return {'trace': self.name, 'started': round(self.started, 3), 'spans': self.spans}
+
+
+class _Span:
+    """Context manager measuring one section"""
+
+    __slots__ = ('trace', 'name', 'record', 'wall', 'cpu', 'memory')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        # Recorded in start order, so nested spans follow their parent
+        self.record = {'span': self.name, 'depth': self.trace._depth}
+        self.trace.spans.append(self.record)
+        self.trace._depth += 1
+        self.memory = tracemalloc.get_traced_memory()[0]
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        self.record['wall_ms'] = round(wall * 1000, 3)
+        self.record['cpu_ms'] = round(cpu * 1000, 3)
+        self.record['alloc_bytes'] = tracemalloc.get_traced_memory()[0] - self.memory
+        if exc_type is not None:
+            self.record['error'] = exc_type.__name__
+        self.trace._depth -= 1
+        return False
+
+
+def process_memory():
+    """Return this process's resident memory in bytes: rss, pss, shared and private
+
+    PSS counts each shared page divided by the number of processes mapping
+    it, so summing it over the workers gives their real footprint. Without
+    /proc (e.g. macOS) only the peak RSS is available.
+    """
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+              'Private_Clean': 'private', 'Private_Dirty': 'private'}
+    report = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+    try:
+        with open('/proc/self/smaps_rollup') as handle:
+            for line in handle:
+                parts = line.split()
+                key = parts[0].rstrip(':')
+                if key in fields:
+                    report[fields[key]] += int(parts[1]) * 1024
+    except OSError:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        report = {'rss': peak if sys.platform == 'darwin' else peak * 1024}
+    return report
+
+
+def current_trace():
+    """Return the trace active on this thread, or None"""
+    return getattr(_local, 'trace', None)
+
+
+def span(name):
+    """Measure the enclosed block in the active trace; a no-op without one"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NULL_SPAN
+    return trace.span(name)
+
+
+class Telemetry:
+    """Process-wide collector of finished traces"""
+
+    def __init__(self, metrics_file=None, trace_memory=True):
+        self.metrics_file = metrics_file
+        self.trace_memory = trace_memory
+        self.totals = {}
+        self.traces = 0
+        self._lock = threading.Lock()
+
+    def start(self, name='rerun'):
+        """Begin a trace on the calling thread and return it"""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        trace = Trace(name)
+        _local.trace = trace
+        return trace
+
+    def finish(self, trace):
+        """End ``trace``: log it, add it to the totals and refresh the metrics file"""
+        if getattr(_local, 'trace', None) is trace:
+            _local.trace = None
+        logger.info(json.dumps(trace.to_dict()))
+        with self._lock:
+            self.traces += 1
+            for record in trace.spans:
+                if 'wall_ms' not in record:
+                    continue
+                totals = self.totals.setdefault(record['span'], [0, 0.0, 0.0, 0])
+                totals[0] += 1
+                totals[1] += record['wall_ms'] / 1000
+                totals[2] += record['cpu_ms'] / 1000
+                totals[3] += record['alloc_bytes']
+            text = self.prometheus_text()
+        if self.metrics_file:
+            atomic_write.write_text(self.metrics_file, text)
+
+    def prometheus_text(self):
+        """Render the span totals in the Prometheus text exposition format"""
+        metrics = [
+            ('dashboard_section_runs_total', 'counter', 'Times each section ran', 0),
+            ('dashboard_section_wall_seconds_total', 'counter', 'Wall time spent in each section', 1),
+            ('dashboard_section_cpu_seconds_total', 'counter', 'CPU time of the script thread in each section', 2),
+            ('dashboard_section_alloc_bytes_total', 'counter', 'Net traced allocations of each section', 3)
+        ]
+        lines = [
+            '# HELP dashboard_reruns_total Traced dashboard reruns',
+            '# TYPE dashboard_reruns_total counter',
+            f'dashboard_reruns_total {self.traces}'
+        ]
+        for metric, kind, description, field in metrics:
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for name, totals in sorted(self.totals.items()):
+                value = totals[field]
+                value = f'{value:.6f}' if isinstance(value, float) else str(value)
+                lines.append(f'{metric}{{section="{_escape(name)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(label):
+    return label.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
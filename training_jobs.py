@@ -0,0 +1,113 @@
+"""
+Background training of EPS models in a process pool
+
+Jobs are keyed by the model's training key, so concurrent sessions asking
+for the same model share one in-flight job. Finished models are written to
+the model store, where later reruns pick them up.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import eps_model
+
+
+class TrainingJobs:
+    """Deduplicated registry of in-flight training jobs"""
+
+    def __init__(self, store, max_workers=1, n_jobs=-1):
+        self.store = store
+        self.n_jobs = n_jobs
+        # spawn, not fork: the Streamlit server process is multi-threaded
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        self._jobs = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, train, *args, full_key=None):
+        """Run ``train(*args, n_jobs=...)`` for ``key`` unless it is running or stored
+
+        ``full_key`` is the training key of an incremental job's rows: if the
+        job falls back to a full fit, the model is stored under it as well.
+        Returns the in-flight future, or None if the model is already stored.
+        """
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is not None or self.store.contains(key):
+                return future
+            self._errors.pop(key, None)
+            future = self._executor.submit(train, *args, n_jobs=self.n_jobs)
+            self._jobs[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done, full_key))
+        return future
+
+    def _finish(self, key, future, full_key=None):
+        try:
+            result = future.result()
+        except Exception as e:
+            with self._lock:
+                self._errors[key] = e
+                self._jobs.pop(key, None)
+            return
+        if full_key is not None and result['mode'] == 'full':
+            # A plain full fit of these rows: store it where a lookup of their training key finds it
+            eps_model.store_result(self.store, full_key, result)
+            self.store.put(key, result)
+        else:
+            eps_model.store_result(self.store, key, result)
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def request(self, filtered_df, previous=None, feature_cols=eps_model.FEATURE_COLS,
+                params=eps_model.DEFAULT_PARAMS):
+        """Return ('ready', result), ('training', key) or ('too_small', None)
+
+        A stored model is returned straight away; otherwise training starts
+        in the background and a later call picks up the stored result. When
+        ``previous`` was trained on a subset of these rows, the job folds the
+        added rows into it instead of refitting from scratch, and the result
+        is stored under its own incremental key: a full fit of these rows
+        stays the only model under their training key.
+        """
+        X, y = eps_model.prepare_training_data(filtered_df, feature_cols)
+        if len(X) <= eps_model.MIN_ROWS:
+            return 'too_small', None
+        key = eps_model.training_key(X, y, feature_cols, params)
+        result = self.store.get(key)
+        if result is not None:
+            return 'ready', result
+        added = None
+        if previous is not None and previous.get('params') == params and 'key' in previous:
+            added = eps_model.plan_update(previous, X, y)
+        if added is not None:
+            job_key = eps_model.incremental_key(key, previous['key'])
+            job = (eps_model.update_or_train, previous, X, y, added, feature_cols, params)
+        else:
+            job_key = key
+            job = (eps_model.train_eps_model, X, y, feature_cols, params)
+        result = self.store.get(job_key)
+        if result is not None:
+            return 'ready', result
+        error = self.pop_error(job_key)
+        if error is not None:
+            raise error
+        self.submit(job_key, *job, full_key=key if job_key != key else None)
+        result = self.store.get(job_key)
+        return ('ready', result) if result is not None else ('training', job_key)
+
+    def is_running(self, key):
+        """Return whether a job for ``key`` is in flight"""
+        with self._lock:
+            return key in self._jobs
+
+    def pop_error(self, key):
+        """Return and clear the exception of a failed job for ``key``"""
+        with self._lock:
+            return self._errors.pop(key, None)
+
+    def shutdown(self):
+        """Stop accepting jobs and release the worker processes"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,214 @@
+"""
+Cross-validated hyperparameter search for the EPS classifier
+
+Every candidate from ``PARAM_GRID`` (or a random sample of it) is scored
+with k-fold cross-validation, grouped by company by default so a company's
+other years never leak into its test fold. Each (candidate, fold) pair is
+one task for a process pool, and its accuracy is stored under a key of the
+training rows, candidate and fold, so a repeated or widened search only
+runs the folds it has not seen yet.
+
+The best candidate by mean fold accuracy is written to ``EPS_PARAMS_FILE``,
+from which the dashboard and precompute.py take the EPS model's
+hyperparameters:
+
+    python tuning.py                    # full grid, 5 company-grouped folds
+    python tuning.py --n-iter 12 --cv kfold --features growth
+"""
+import argparse
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_selection import SelectFromModel
+from sklearn.model_selection import GroupKFold, ParameterGrid, ParameterSampler, StratifiedKFold
+
+import atomic_write
+import eps_model
+
+# Searched settings of the final forest; the selector keeps its defaults
+PARAM_GRID = {
+    'n_estimators': [100, 200],
+    'max_depth': [3, 5, 8, None],
+    'min_samples_leaf': [1, 5],
+    'max_features': ['sqrt', 0.5]
+}
+
+# Per-worker state, set up once by _init_worker
+_worker = {}
+
+
+def candidate_params(grid=PARAM_GRID, n_iter=None, random_state=42, base=eps_model.DEFAULT_PARAMS):
+    """Return the full parameter sets to score: the whole grid, or ``n_iter`` samples of it"""
+    if n_iter is None:
+        settings = list(ParameterGrid(grid))
+    else:
+        settings = list(ParameterSampler(grid, n_iter=n_iter, random_state=random_state))
+    candidates = []
+    for setting in settings:
+        params = copy.deepcopy(base)
+        params['model'].update(setting)
+        candidates.append(params)
+    return candidates
+
+
+def make_folds(X, y, groups, cv='group', n_splits=5, random_state=42):
+    """Return (train positions, test positions) per fold"""
+    if cv == 'group':
+        n_splits = min(n_splits, len(np.unique(groups)))
+        splits = GroupKFold(n_splits=n_splits).split(X, y, groups)
+    elif cv == 'kfold':
+        splits = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(X, y)
+    else:
+        raise ValueError(f"Unknown cross-validation scheme: {cv}")
+    return [(train, test) for train, test in splits]
+
+
+def fold_key(data_key, params, cv, n_splits, fold):
+    """Return the store key of one candidate's score on one fold"""
+    state = json.dumps([data_key, params, cv, n_splits, fold], sort_keys=True)
+    return 'fold-' + hashlib.sha256(state.encode()).hexdigest()[:32]
+
+
+def _init_worker(X, y, folds):
+    _worker.update(X=X, y=y, folds=folds, selectors={})
+
+
+def _selected(fold, selector_params):
+    # The selector does not depend on the searched settings: fit it once per fold and worker
+    key = (fold, json.dumps(selector_params, sort_keys=True))
+    support = _worker['selectors'].get(key)
+    if support is None:
+        train = _worker['folds'][fold][0]
+        selector = SelectFromModel(RandomForestClassifier(**selector_params, n_jobs=1))
+        selector.fit(_worker['X'].iloc[train], _worker['y'].iloc[train])
+        support = _worker['selectors'][key] = selector.get_support()
+    return support
+
+
+def score_fold(params, fold):
+    """Fit the selector and model on one fold's training rows; return the test accuracy"""
+    start = time.perf_counter()
+    train, test = _worker['folds'][fold]
+    X = _worker['X'].to_numpy()[:, _selected(fold, params['selector'])]
+    y = _worker['y'].to_numpy()
+    model = RandomForestClassifier(**params['model'], n_jobs=1)
+    model.fit(X[train], y[train])
+    return {'accuracy': float(model.score(X[test], y[test])), 'seconds': time.perf_counter() - start}
+
+
+def search(X, y, groups, store, candidates, cv='group', n_splits=5, workers=None, random_state=42):
+    """Score every candidate on every fold, reusing stored fold scores; return the ranked results"""
+    folds = make_folds(X, y, groups, cv, n_splits, random_state)
+    # Group folds depend on which company each row belongs to, not only on the rows' values
+    group_digest = hashlib.sha256(pd.util.hash_array(np.asarray(groups, dtype=object)).tobytes()).hexdigest()
+    data_key = eps_model.training_key(
+        X, y, list(X.columns), {'cv_random_state': random_state, 'groups': group_digest[:16]}
+    )
+    scores = {}
+    pending = []
+    for index, params in enumerate(candidates):
+        for fold in range(len(folds)):
+            key = fold_key(data_key, params, cv, len(folds), fold)
+            stored = store.get(key)
+            if stored is not None:
+                scores[index, fold] = stored
+            else:
+                pending.append((index, fold, key))
+
+    if pending:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+        # spawn, like the training pool: callers may be multi-threaded
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(X, y, folds)
+        ) as pool:
+            futures = [(index, fold, key, pool.submit(score_fold, candidates[index], fold))
+                       for index, fold, key in pending]
+            for index, fold, key, future in futures:
+                scores[index, fold] = future.result()
+                store.put(key, scores[index, fold])
+
+    results = []
+    for index, params in enumerate(candidates):
+        accuracies = [scores[index, fold]['accuracy'] for fold in range(len(folds))]
+        results.append({
+            'params': params,
+            'mean_accuracy': float(np.mean(accuracies)),
+            'std_accuracy': float(np.std(accuracies)),
+            'fold_accuracies': accuracies
+        })
+    # Ties go to the cheaper forest
+    results.sort(key=lambda result: (-result['mean_accuracy'], result['params']['model']['n_estimators']))
+    return results, {'folds': len(folds), 'computed': len(pending), 'reused': len(scores) - len(pending)}
+
+
+def save_best(path, feature_set, best, cv, n_folds, rows, data_version):
+    """Record the winning parameters for a feature set, keeping the other sets' entries"""
+    try:
+        with open(path) as handle:
+            tuned = json.load(handle)
+    except (OSError, ValueError):
+        tuned = {}
+    tuned[feature_set] = {
+        'params': best['params'],
+        'mean_accuracy': best['mean_accuracy'],
+        'std_accuracy': best['std_accuracy'],
+        'cv': cv,
+        'folds': n_folds,
+        'rows': rows,
+        'data_version': data_version,
+        'searched_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    atomic_write.write_json(path, tuned)
+
+
+def main(argv=None):
+    from app_config import EPS_PARAMS_FILE, MODEL_STORE_MB
+    from cache_backend import open_store
+    from shared_dataset import open_dataset
+
+    parser = argparse.ArgumentParser(description='Tune the EPS model with parallel cross-validation')
+    parser.add_argument('--features', choices=sorted(eps_model.FEATURE_SETS), default='base')
+    parser.add_argument('--cv', choices=['group', 'kfold'], default='group',
+                        help='folds grouped by company, or stratified k-fold over rows')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--n-iter', type=int, default=None, help='random search over this many candidates')
+    parser.add_argument('--max-rows', type=int, default=200_000, help='tune on a sample of at most this many rows')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--dry-run', action='store_true', help='report the best candidate without saving it')
+    args = parser.parse_args(argv)
+
+    data = open_dataset().current()
+    rows = data.frame
+    if len(rows) > args.max_rows:
+        rows = rows.sample(args.max_rows, random_state=0).sort_index()
+    feature_cols = eps_model.FEATURE_SETS[args.features]
+    X, y = eps_model.prepare_training_data(rows, feature_cols)
+    candidates = candidate_params(n_iter=args.n_iter)
+
+    start = time.perf_counter()
+    results, counts = search(
+        X, y, rows['Company'].to_numpy(), open_store('models', MODEL_STORE_MB * 1024 * 1024),
+        candidates, cv=args.cv, n_splits=args.folds, workers=args.workers
+    )
+    print(f"Scored {len(candidates)} candidates x {counts['folds']} folds on {len(X)} rows in "
+          f"{time.perf_counter() - start:.2f}s ({counts['computed']} fits, {counts['reused']} reused)")
+    for result in results[:5]:
+        print(f"  {result['mean_accuracy']:.2%} ± {result['std_accuracy']:.2%}  {result['params']['model']}")
+    if not args.dry_run:
+        save_best(EPS_PARAMS_FILE, args.features, results[0], args.cv, counts['folds'], len(X), data.version)
+        print(f"Saved the best parameters for '{args.features}' to {EPS_PARAMS_FILE}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())